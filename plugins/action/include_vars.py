@@ -15,7 +15,9 @@ from ansible.plugins.action import ActionBase
 from ansible.errors import AnsibleError
 
 from ansible_collections.itential.core.plugins.module_utils import display
+from ansible_collections.itential.core.plugins.module_utils import metrics
 from ansible_collections.itential.core.plugins.module_utils import module
+from ansible_collections.itential.core.plugins.module_utils import profiler
 
 
 class ActionModule(ActionBase):
@@ -24,6 +26,9 @@ class ActionModule(ActionBase):
     _supports_async = False
     _requires_connection = False
 
+    @metrics.flushed
+    @display.traced("include_vars")
+    @profiler.timed("include_vars")
     def run(self, tmp=None, task_vars=None):
         result = {"changed": False}
 
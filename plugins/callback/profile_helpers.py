@@ -0,0 +1,201 @@
+# Copyright 2024, Itential Inc. All Rights Reserved
+
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = """
+---
+name: profile_helpers
+author: Itential
+type: aggregate
+
+short_description: Reports the time spent in itential.core helpers
+
+description:
+  - The C(itential.core.profile_helpers) callback plugin aggregates the
+    time spent by each task on each host in the itential.core helpers
+    C(args.get), C(module.get), C(hosts.new), C(http.send_request) and
+    the M(itential.core.include_vars) action.
+  - A summary sorted by the time spent is displayed at the end of each
+    play and a report can optionally be written to a JSON or CSV file.
+
+requirements:
+  - enable in configuration
+
+options:
+  output:
+    description:
+      - The path of the report file to write at the end of the
+        playbook.  The format is CSV when the file name ends with
+        C(.csv) and JSON otherwise.  No report is written if not set
+    type: path
+    env:
+      - name: ITENTIAL_PROFILE_OUTPUT
+    ini:
+      - section: callback_profile_helpers
+        key: output
+
+  limit:
+    description:
+      - The maximum number of rows displayed in the summary
+    type: int
+    default: 20
+    env:
+      - name: ITENTIAL_PROFILE_LIMIT
+    ini:
+      - section: callback_profile_helpers
+        key: limit
+"""
+
+import os
+import csv
+import json
+import tempfile
+
+from ansible.plugins.callback import CallbackBase
+
+from ansible_collections.itential.core.plugins.module_utils import profiler
+
+
+class CallbackModule(CallbackBase):
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = "aggregate"
+    CALLBACK_NAME = "itential.core.profile_helpers"
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self, *args, **kwargs):
+        super(CallbackModule, self).__init__(*args, **kwargs)
+
+        # the workers are forked from this process so they inherit the
+        # environment variable and append their timings to the file
+        fd, self.path = tempfile.mkstemp(prefix="itential-profile-", suffix=".jsonl")
+        os.close(fd)
+        os.environ[profiler.PROFILE_FILE_ENV] = self.path
+
+        self.offset = 0
+        self.play = None
+        self.tasks = dict()
+        self.rows = list()
+
+    def v2_playbook_on_play_start(self, play):
+        self.summarize()
+        self.play = play.get_name().strip()
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self.tasks[task._uuid] = task.get_name().strip()
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self.tasks[task._uuid] = task.get_name().strip()
+
+    def v2_playbook_on_stats(self, stats):
+        self.summarize()
+
+        output = self.get_option("output")
+        if output:
+            self.write(output)
+
+        os.environ.pop(profiler.PROFILE_FILE_ENV, None)
+
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def load(self) -> dict:
+        """Loads the timing records added since the last call
+
+        Returns:
+            A dict object that maps (task, host, helper) to a list of
+            [calls, seconds]
+        """
+        totals = dict()
+
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                data = f.read()
+        except OSError:
+            return totals
+
+        # a worker may still be writing the last line
+        end = data.rfind(b"\n") + 1
+        self.offset += end
+
+        for line in data[:end].splitlines():
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+
+            # helpers called outside of a worker, for instance by a
+            # lookup plugin in the controller, have no task
+            task = self.tasks.get(item["task"], item["task"]) if item["task"] is not None else "(no task)"
+
+            key = (task, item["host"], item["name"])
+            entry = totals.setdefault(key, [0, 0.0])
+            entry[0] += 1
+            entry[1] += item["seconds"]
+
+        return totals
+
+    def summarize(self) -> None:
+        """Displays the summary for the play that just ended
+
+        Returns:
+            None
+        """
+        totals = self.load()
+
+        if not totals:
+            return
+
+        rows = sorted(
+            (
+                {"play": self.play, "task": task, "host": host, "helper": name, "calls": calls, "seconds": seconds}
+                for (task, host, name), (calls, seconds) in totals.items()
+            ),
+            key=lambda row: row["seconds"],
+            reverse=True,
+        )
+
+        self.rows.extend(rows)
+
+        self._display.banner(f"ITENTIAL HELPER PROFILE [{self.play}]")
+
+        for row in rows[:self.get_option("limit")]:
+            self._display.display(
+                f"{str(row['task'])[:40]:<40} {str(row['host'])[:20]:<20} {row['helper']:<18} "
+                f"{row['calls']:>6} {row['seconds']:>10.4f}s"
+            )
+
+        helpers = dict()
+        for row in rows:
+            helpers[row["helper"]] = helpers.get(row["helper"], 0.0) + row["seconds"]
+
+        self._display.display("")
+        for name, seconds in sorted(helpers.items(), key=lambda item: item[1], reverse=True):
+            self._display.display(f"{name:<18} {seconds:>10.4f}s")
+
+    def write(self, path) -> None:
+        """Writes the report for the playbook
+
+        Args:
+            path (str): The path of the report file
+
+        Returns:
+            None
+        """
+        fields = ("play", "task", "host", "helper", "calls", "seconds")
+
+        with open(path, "w", newline="") as f:
+            if path.endswith(".csv"):
+                writer = csv.DictWriter(f, fieldnames=fields)
+                writer.writeheader()
+                writer.writerows(self.rows)
+            else:
+                json.dump(self.rows, f, indent=2)
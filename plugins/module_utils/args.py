@@ -3,14 +3,265 @@
 # GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import os
+import copy
+import hashlib
 import importlib
+import importlib.util
 
-from typing import Any
+from typing import Any, Callable
+from dataclasses import dataclass
 
 from ansible.errors import AnsibleError
 from ansible.module_utils.common import yaml
 
+from ansible_collections.itential.core.plugins.module_utils import cache
 from ansible_collections.itential.core.plugins.module_utils import display
+from ansible_collections.itential.core.plugins.module_utils import profiler
+
+
+TYPES = {
+    "bool": bool,
+    "int": int,
+    "dict": dict,
+    "list": list,
+    "str": str,
+}
+
+
+_validators = {}
+
+
+def choiceset(choices) -> Any:
+    """Returns the collection used to look up a value in choices
+
+    Args:
+        choices (list): The valid choices from the option schema
+
+    Returns:
+        A frozenset of the choices or a tuple if any of the choices,
+        for instance a dict or list, is unhashable
+    """
+    try:
+        return frozenset(choices)
+    except TypeError:
+        return tuple(choices)
+
+
+def contains(choices, value) -> bool:
+    """Checks if value is a member of choices
+
+    Unhashable values can never be a member of a frozenset so they are
+    treated as not found rather than raising a `TypeError`.
+
+    Args:
+        choices (frozenset): The valid choices, see `choiceset`
+        value (any): The value to check
+
+    Returns:
+        A boolean indicating if the value is one of the choices
+    """
+    try:
+        return value in choices
+    except TypeError:
+        return False
+
+
+class Compiler(object):
+    """Compiler generates a validation function from an option schema
+
+    The Compiler object walks an option schema once and emits the
+    source for a Python function that performs the same checks as the
+    recursive schema walk with all type names, aliases, defaults and
+    nested suboptions resolved at compile time.
+
+    Args:
+        lines (list): The lines of generated source
+        namespace (dict): The globals for the generated function which
+            holds any constant values referenced by the source
+    """
+    def __init__(self):
+        self.lines = list()
+        self.namespace = {
+            "AnsibleError": AnsibleError,
+            "contains": contains,
+        }
+
+    def emit(self, depth, line) -> None:
+        """Appends a line of source at the specified indentation
+
+        Args:
+            depth (int): The indentation level of the line
+            line (str): The line of source
+
+        Returns:
+            None
+        """
+        self.lines.append(f"{'    ' * depth}{line}")
+
+    def constant(self, value) -> str:
+        """Binds a value in the namespace of the generated function
+
+        Args:
+            value (any): The value to bind
+
+        Returns:
+            The name the value is bound to
+        """
+        name = f"_c{len(self.namespace)}"
+        self.namespace[name] = value
+        return name
+
+    def option(self, var, option, depth) -> None:
+        """Emits the source to validate var against option
+
+        Args:
+            var (str): The name of the variable that holds the value
+            option (dict): The schema used to validate the value
+            depth (int): The indentation level of the emitted source
+
+        Returns:
+            None
+        """
+        choices = option.get("choices")
+        if choices:
+            found = self.constant(choiceset(choices))
+            text = self.constant(f"invalid value, expected one of {', '.join(str(c) for c in choices)}, got ")
+            self.emit(depth, f"if not contains({found}, {var}):")
+            self.emit(depth + 1, f"raise AnsibleError({text} + str({var}))")
+
+        field_type = option.get("type") or "str"
+        self.datatype(var, field_type, depth)
+
+        suboptions = option.get("suboptions")
+
+        if field_type == "list":
+            eletype = option.get("elements")
+            if TYPES.get(eletype) is not None or suboptions is not None:
+                ele = f"e{depth}"
+                self.emit(depth, f"for {ele} in {var}:")
+                self.datatype(ele, eletype, depth + 1)
+                if suboptions is not None:
+                    if eletype != "dict":
+                        self.datatype(ele, "dict", depth + 1)
+                    self.suboptions(ele, suboptions, depth + 1)
+
+        elif suboptions is not None:
+            if field_type == "dict":
+                self.suboptions(var, suboptions, depth)
+                self.emit(depth, f"if {var}:")
+            else:
+                self.emit(depth, f"if {var} and isinstance({var}, dict):")
+            self.unknown(var, suboptions, depth + 1)
+
+    def datatype(self, var, fieldtype, depth) -> None:
+        """Emits the source to check the data type of var
+
+        Args:
+            var (str): The name of the variable that holds the value
+            fieldtype (str): The field type to check against
+            depth (int): The indentation level of the emitted source
+
+        Returns:
+            None
+        """
+        datatype = TYPES.get(fieldtype)
+        if datatype is not None:
+            self.emit(depth, f"if not isinstance({var}, {datatype.__name__}):")
+            self.emit(depth + 1, "raise AnsibleError(\"invalid data type for field\")")
+
+    def suboptions(self, var, suboptions, depth) -> None:
+        """Emits the source to resolve and validate each suboption
+
+        Args:
+            var (str): The name of the variable that holds the dict value
+            suboptions (dict): The suboptions schema
+            depth (int): The indentation level of the emitted source
+
+        Returns:
+            None
+        """
+        value = f"v{depth}"
+
+        for key, item in suboptions.items():
+            self.emit(depth, f"{value} = {var}.get({key!r})")
+
+            for alias in item.get("aliases") or []:
+                self.emit(depth, f"if {value} is None:")
+                self.emit(depth + 1, f"{value} = {var}.get({alias!r})")
+
+            if item.get("default") is not None:
+                self.emit(depth, f"if {value} is None:")
+                self.emit(depth + 1, f"{value} = {self.constant(item.get('default'))}")
+
+            if item.get("required"):
+                self.emit(depth, f"if not {value}:")
+                self.emit(depth + 1, f"raise AnsibleError({f'missing required argument: {key}'!r})")
+
+            self.emit(depth, f"if {value} is not None:")
+            size = len(self.lines)
+            self.option(value, item, depth + 1)
+            if len(self.lines) == size:
+                self.emit(depth + 1, "pass")
+
+    def unknown(self, var, suboptions, depth) -> None:
+        """Emits the source to reject keys not defined in suboptions
+
+        Args:
+            var (str): The name of the variable that holds the dict value
+            suboptions (dict): The suboptions schema
+            depth (int): The indentation level of the emitted source
+
+        Returns:
+            None
+        """
+        keys = self.constant(frozenset(suboptions))
+        self.emit(depth, f"for key in {var}:")
+        self.emit(depth + 1, f"if key not in {keys}:")
+        self.emit(depth + 2, "raise AnsibleError(f\"unknown argument: {key}\")")
+
+    def build(self, option) -> Callable:
+        """Generates and compiles the validation function for option
+
+        Args:
+            option (dict): The schema used to validate the value
+
+        Returns:
+            A function that accepts a value and raises an `AnsibleError`
+            if the value does not conform to the option schema
+        """
+        self.emit(0, "def validate(value):")
+        self.option("value", option, 1)
+        self.emit(1, "return None")
+
+        source = "\n".join(self.lines)
+        exec(compile(source, "<itential.core.args.validate>", "exec"), self.namespace)
+
+        return self.namespace["validate"]
+
+
+def validator(option) -> Callable:
+    """Returns the compiled validation function for an option schema
+
+    The validation function is generated the first time a schema is
+    seen and cached for the life of the process.
+
+    Args:
+        option (dict): The schema used to validate the value
+
+    Returns:
+        A function that accepts a value and validates it against the
+        option schema
+    """
+    key = repr(option)
+
+    func = _validators.get(key)
+
+    if func is None:
+        func = Compiler().build(option)
+        _validators[key] = func
+
+    return func
 
 
 def validate(value, option) -> None:
@@ -27,34 +278,7 @@ def validate(value, option) -> None:
     Returns:
         None
     """
-    choices = option.get("choices")
-    if choices and value not in choices:
-        raise AnsibleError(f"invalid value, expected one of {', '.join(choices)}, got {value}")
-
-    field_type = option.get("type") or "str"
-
-    validatetype(field_type, value)
-
-    if field_type == "list":
-        eletype = option.get("elements")
-        for ele in value:
-            validatetype(eletype, ele)
-
-    suboptions = option.get("suboptions")
-
-    if suboptions is not None:
-        if field_type == "dict":
-            for key, item in suboptions.items():
-                getvalue(value, key, item)
-        elif field_type == "list":
-            for ele in value:
-                for key, item in suboptions.items():
-                    getvalue(ele, key, item)
-
-    if value and isinstance(value, dict) and suboptions is not None:
-        for key in value:
-            if key not in suboptions:
-                raise AnsibleError(f"unknown argument: {key}")
+    validator(option)(value)
 
 
 def validatetype(fieldtype, value) -> None:
@@ -75,12 +299,9 @@ def validatetype(fieldtype, value) -> None:
     Raises:
         AnsibleError: If the value is not the correct field type
     """
-    if (fieldtype == "bool" and not isinstance(value, bool)) or \
-        (fieldtype == "int" and not isinstance(value, int)) or \
-        (fieldtype == "dict" and not isinstance(value, dict)) or \
-        (fieldtype == "list" and not isinstance(value, list)) or \
-        (fieldtype == "str" and not isinstance(value, str)):
-            raise AnsibleError("invalid data type for field")
+    datatype = TYPES.get(fieldtype)
+    if datatype is not None and not isinstance(value, datatype):
+        raise AnsibleError("invalid data type for field")
 
 
 def getvalue(args, name, opt) -> Any:
@@ -128,6 +349,412 @@ def getvalue(args, name, opt) -> Any:
     return value
 
 
+@dataclass
+class Violation(object):
+    """Violation represents a single value that does not conform to its schema
+
+    Args:
+        path (str): The JSON path to the value, for instance
+            `$.interfaces[0].name`
+
+        message (str): A description of the violation
+
+        expected (str): The data type expected by the schema, if any
+
+        actual (str): The data type of the value, if any
+    """
+    path: str
+    message: str
+    expected: str = None
+    actual: str = None
+
+    def __str__(self):
+        return f"{self.path}: {self.message}"
+
+
+class ValidationError(AnsibleError):
+    """ValidationError is raised when one or more values are not valid
+
+    Args:
+        violations (list): The list of `Violation` objects
+    """
+    def __init__(self, violations):
+        self.violations = violations
+        lines = "\n".join(f"  {item}" for item in violations)
+        super().__init__(f"found {len(violations)} invalid argument(s):\n{lines}")
+
+
+def typename(value) -> str:
+    """Returns the name of the data type of value
+
+    Args:
+        value (any): The value to return the type name for
+
+    Returns:
+        The name of the data type
+    """
+    return type(value).__name__
+
+
+def report(value, option, path="$") -> list:
+    """Reports every violation of the option schema by value
+
+    Unlike `validate`, this function does not stop at the first
+    violation.  The entire value is walked once and every violation is
+    returned along with the JSON path to the offending value.  Values
+    below a node with the wrong data type are not checked.
+
+    Args:
+        value (any): The value to validate
+        option (dict): The schema used to validate the value
+        path (str): The JSON path to value
+
+    Returns:
+        A list of `Violation` objects which is empty if the value is valid
+    """
+    violations = list()
+
+    choices = option.get("choices")
+    if choices and not contains(choiceset(choices), value):
+        violations.append(Violation(
+            path,
+            f"invalid value, expected one of {', '.join(str(c) for c in choices)}, got {value}",
+        ))
+
+    field_type = option.get("type") or "str"
+
+    if not _reporttype(violations, path, field_type, value):
+        return violations
+
+    suboptions = option.get("suboptions")
+
+    if field_type == "list":
+        eletype = option.get("elements")
+        for index, ele in enumerate(value):
+            elepath = f"{path}[{index}]"
+            if not _reporttype(violations, elepath, eletype, ele):
+                continue
+            if suboptions is not None:
+                if not _reporttype(violations, elepath, "dict", ele):
+                    continue
+                _reportsuboptions(violations, elepath, ele, suboptions)
+
+    elif suboptions is not None and isinstance(value, dict):
+        if field_type == "dict":
+            _reportsuboptions(violations, path, value, suboptions)
+        for key in value:
+            if key not in suboptions:
+                violations.append(Violation(f"{path}.{key}", f"unknown argument: {key}"))
+
+    return violations
+
+
+def _reporttype(violations, path, fieldtype, value) -> bool:
+    """Appends a violation if value is not the correct data type
+
+    Args:
+        violations (list): The list to append the violation to
+        path (str): The JSON path to value
+        fieldtype (str): The field type to check against
+        value (any): The value to check
+
+    Returns:
+        A boolean indicating if the value is the correct data type
+    """
+    datatype = TYPES.get(fieldtype)
+    if datatype is not None and not isinstance(value, datatype):
+        violations.append(Violation(
+            path,
+            f"invalid data type, expected {fieldtype}, got {typename(value)}",
+            fieldtype,
+            typename(value),
+        ))
+        return False
+    return True
+
+
+def _reportsuboptions(violations, path, args, suboptions) -> None:
+    """Appends the violations for each suboption of args
+
+    Args:
+        violations (list): The list to append the violations to
+        path (str): The JSON path to args
+        args (dict): The dict value that holds the suboptions
+        suboptions (dict): The suboptions schema
+
+    Returns:
+        None
+    """
+    for key, item in suboptions.items():
+        violations.extend(_reportvalue(args, key, item, f"{path}.{key}"))
+
+
+def _reportvalue(args, name, opt, path) -> list:
+    """Reports the violations for the value specified by name in args
+
+    This is the collect-all equivalent of `getvalue`.
+
+    Args:
+        args (dict): A dictionary object that contains the values
+        name (str): The name of the value to check
+        opt (dict): The schema used to validate the value
+        path (str): The JSON path to the value
+
+    Returns:
+        A list of `Violation` objects
+    """
+    value = args.get(name)
+
+    if value is None:
+        for ele in opt.get("aliases") or []:
+            value = args.get(ele)
+            if value is not None:
+                break
+
+    if value is None and opt.get("default") is not None:
+        value = opt.get("default")
+
+    if not value and opt.get("required"):
+        return [Violation(
+            path,
+            f"missing required argument: {name}",
+            opt.get("type") or "str",
+            typename(value),
+        )]
+
+    if value is not None:
+        return report(value, opt, path)
+
+    return []
+
+
+_registry = {}
+
+
+class Spec(object):
+    """Spec is the compiled form of a module options schema
+
+    The Spec object is constructed once from the `options` section of
+    a module's DOCUMENTATION and holds the precomputed lookup tables
+    needed to resolve arguments from a task without walking the raw
+    schema each time.
+
+    Args:
+        options (dict): The `options` section of the module documentation
+        keys (dict): Maps each option name to the tuple of keys (the
+            name followed by any aliases) to search for in the task args
+        defaults (dict): Maps each option name to its default value
+        mutable (frozenset): The set of option names with a list or dict
+            default value which is copied each time it is returned
+        required (frozenset): The set of option names that are required
+        validators (dict): Maps each option name to the compiled function
+            used to validate its value
+        valid_arguments (frozenset): The set of all option names and
+            aliases accepted by the module
+    """
+    def __init__(self, options):
+        self.options = options
+        self.keys = {}
+        self.defaults = {}
+        self.validators = {}
+
+        required = set()
+        mutable = set()
+
+        for key, opt in options.items():
+            self.keys[key] = (key,) + tuple(opt.get("aliases") or ())
+
+            if opt.get("default") is not None:
+                self.defaults[key] = opt.get("default")
+                if isinstance(opt.get("default"), (list, dict)):
+                    mutable.add(key)
+
+            if opt.get("required"):
+                required.add(key)
+
+            self.validators[key] = validator(opt)
+
+        self.required = frozenset(required)
+        self.mutable = frozenset(mutable)
+        self.valid_arguments = frozenset(k for keys in self.keys.values() for k in keys)
+
+    def check(self, args) -> None:
+        """Checks that all keys in args are valid arguments
+
+        Args:
+            args (dict): The arguments passed to the module
+
+        Returns:
+            None
+
+        Raises:
+            AnsibleError: If args contains an unknown argument
+        """
+        for key in args:
+            if key not in self.valid_arguments:
+                display.v(f"key is {key}")
+                raise AnsibleError(f"invalid argument: {key}")
+
+    def value(self, args, name) -> Any:
+        """Gets the value specified by name from args
+
+        This method is the compiled equivalent of `getvalue`.  It assumes
+        the args have already been checked for unknown arguments.
+
+        Args:
+            args (dict): A dictionary object that contains the values
+            name (str): The name of the option to retrieve
+
+        Returns:
+            Either the value from `args`, a default value or None
+
+        Raises:
+            AnsibleError: When a required value is not present or a value
+                is not valid
+        """
+        value = None
+
+        for key in self.keys[name]:
+            value = args.get(key)
+            if value is not None:
+                break
+        else:
+            value = self.defaults.get(name)
+            # the spec is shared by every task in the process so a task
+            # must not be able to modify the default for later tasks
+            if name in self.mutable:
+                value = copy.deepcopy(value)
+
+        if not value and name in self.required:
+            raise AnsibleError(f"missing required argument: {name}")
+
+        if value is not None:
+            try:
+                self.validators[name](value)
+            except AnsibleError as exc:
+                display.vvv(str(exc))
+                raise exc
+
+        return value
+
+    def report(self, args) -> list:
+        """Reports every violation in args
+
+        Args:
+            args (dict): The arguments passed to the module
+
+        Returns:
+            A list of `Violation` objects which is empty if all of the
+            arguments are valid
+        """
+        violations = list()
+
+        for key in args:
+            if key not in self.valid_arguments:
+                violations.append(Violation(f"$.{key}", f"invalid argument: {key}"))
+
+        for name, opt in self.options.items():
+            violations.extend(_reportvalue(args, name, opt, f"$.{name}"))
+
+        return violations
+
+    def resolve(self, args, collect=False) -> dict:
+        """Resolves the value of every option from args in a single pass
+
+        Args:
+            args (dict): The arguments passed to the module
+            collect (bool): When True, all of the arguments are checked
+                before raising an error that reports every violation
+                instead of raising on the first one
+
+        Returns:
+            A dict object that maps each option name to its value
+
+        Raises:
+            AnsibleError: If any argument is unknown or not valid
+            ValidationError: If collect is True and any argument is not valid
+        """
+        if collect is True:
+            violations = self.report(args)
+            if violations:
+                exc = ValidationError(violations)
+                display.vvv(str(exc))
+                raise exc
+
+        self.check(args)
+        return dict((name, self.value(args, name)) for name in self.keys)
+
+
+def options(modname) -> dict:
+    """Returns the options section of a module's documentation
+
+    When the on-disk cache is enabled, the parsed options are stored
+    in the cache keyed by the path of the module file and validated
+    against its modification time and content hash.  On a cache hit,
+    the module is neither imported nor is its documentation parsed.
+
+    Args:
+        modname (str): The full Python name of the module
+
+    Returns:
+        The options for the module as a dict object
+    """
+    origin = None
+
+    if cache.directory("specs") is not None:
+        found = importlib.util.find_spec(modname)
+        origin = found.origin if found is not None else None
+
+    if origin is not None:
+        try:
+            with open(origin, "rb") as f:
+                stat = os.fstat(f.fileno())
+                digest = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            origin = None
+
+    if origin is not None:
+        cached = cache.load("specs", origin)
+        if isinstance(cached, tuple) and cached[:2] == (stat.st_mtime_ns, digest):
+            return cached[2]
+
+    mod = importlib.import_module(modname)
+
+    docs = yaml.yaml_load(mod.DOCUMENTATION)
+
+    opts = docs.get("options") or {}
+
+    if origin is not None:
+        cache.dump("specs", origin, (stat.st_mtime_ns, digest, opts))
+
+    return opts
+
+
+def load(action) -> Spec:
+    """Loads the compiled options spec for a module
+
+    The module documentation is imported and parsed the first time
+    the spec for an action is requested.  The compiled spec is cached
+    for the life of the process and returned on subsequent calls.
+
+    Args:
+        action (str): The fully qualified name of the module
+
+    Returns:
+        A `Spec` object for the module
+    """
+    spec = _registry.get(action)
+
+    if spec is None:
+        tokens = action.split(".")
+        spec = Spec(options(f"ansible_collections.{tokens[0]}.{tokens[1]}.plugins.modules.{tokens[2]}"))
+        _registry[action] = spec
+
+    return spec
+
+
+@display.traced("args.get")
+@profiler.timed("args.get")
 def get(name, task) -> Any:
     """Retrieves the value of an argument from the task.
 
@@ -147,30 +774,11 @@ def get(name, task) -> Any:
     Raises:
         AnsibleError: If the value is not valid
     """
-    tokens = task.action.split(".")
-    mod = importlib.import_module(f"ansible_collections.{tokens[0]}.{tokens[1]}.plugins.modules.{tokens[2]}")
+    spec = load(task.action)
 
-    docs = yaml.yaml_load(mod.DOCUMENTATION)
-
-    options = docs.get("options") or {}
-
-    opt = options.get(name)
-
-    if not opt:
+    if name not in spec.keys:
         raise AnsibleError(f"invalid argument: {name}")
 
-    # construct a set of valid arguments which includes the option key and
-    # any configured aliases
-    valid_arguments = set()
-
-    for key, value in options.items():
-        valid_arguments.add(key)
-        for item in value.get("aliases") or []:
-            valid_arguments.add(item)
-
-    for key in task.args:
-        if key not in valid_arguments:
-            display.v(f"key is {key}")
-            raise AnsibleError(f"invalid argument: {key}")
+    spec.check(task.args)
 
-    return getvalue(task.args, name, opt)
+    return spec.value(task.args, name)
@@ -0,0 +1,243 @@
+# Copyright 2024, Itential Inc. All Rights Reserved
+
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import sys
+import stat
+import time
+import marshal
+import hashlib
+import tempfile
+
+from typing import Any
+
+from ansible.errors import AnsibleError
+
+from ansible_collections.itential.core.plugins.module_utils import display
+
+
+CACHE_DIR_ENV = "ITENTIAL_CACHE_DIR"
+
+
+def directory(namespace) -> str:
+    """Returns the cache directory for a namespace
+
+    The on-disk cache is optional and is only enabled when the
+    `ITENTIAL_CACHE_DIR` environment variable is set.
+
+    Args:
+        namespace (str): The name of the subdirectory used to group
+            related cache entries
+
+    Returns:
+        The path to the cache directory or None if caching is disabled
+    """
+    root = os.environ.get(CACHE_DIR_ENV)
+    if not root:
+        return None
+    return os.path.join(root, namespace)
+
+
+def makedirs(path) -> None:
+    """Creates a directory that is private to the current user
+
+    The directory holds state, such as credentials, that other users
+    must not be able to read or replace.  Every directory below the
+    system temporary directory, or every directory that has to be
+    created when the path is elsewhere, is created with mode 0700 and
+    must be a directory, not a symlink, that is owned by the current
+    user and not accessible by other users.
+
+    Args:
+        path (str): The directory to create
+
+    Returns:
+        None
+
+    Raises:
+        AnsibleError: If a directory is owned by another user or is
+            accessible by other users
+    """
+    path = os.path.abspath(path)
+    tmp = os.path.abspath(tempfile.gettempdir())
+
+    if os.path.commonpath((path, tmp)) == tmp:
+        base = tmp
+    else:
+        base = os.path.dirname(path)
+        while not os.path.isdir(base) and os.path.dirname(base) != base:
+            base = os.path.dirname(base)
+
+    current = base
+
+    for part in os.path.relpath(path, base).split(os.sep):
+        current = os.path.join(current, part)
+
+        try:
+            os.mkdir(current, 0o700)
+        except FileExistsError:
+            pass
+
+        info = os.lstat(current)
+
+        if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise AnsibleError(
+                f"directory {current} must be owned by the current user and not accessible by other users"
+            )
+
+
+def filename(namespace, key) -> str:
+    """Returns the path to the cache file for key
+
+    The file name is derived from a hash of the key and includes the
+    interpreter cache tag since the serialization format is specific
+    to the Python version.
+
+    Args:
+        namespace (str): The cache namespace
+        key (str): The key that identifies the cache entry
+
+    Returns:
+        The path to the cache file or None if caching is disabled
+    """
+    path = directory(namespace)
+    if path is None:
+        return None
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return os.path.join(path, f"{digest}.{sys.implementation.cache_tag}")
+
+
+def load(namespace, key) -> Any:
+    """Loads a value from the cache
+
+    Readers never see a partially written file since entries are
+    replaced atomically by `dump`.  Any entry that cannot be read is
+    treated as a cache miss.
+
+    Args:
+        namespace (str): The cache namespace
+        key (str): The key that identifies the cache entry
+
+    Returns:
+        The cached value or None if the entry does not exist
+    """
+    path = filename(namespace, key)
+    if path is None:
+        return None
+
+    try:
+        with open(path, "rb") as f:
+            return marshal.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, ValueError, TypeError) as exc:
+        display.vvvv(f"unable to read cache entry {path}: {exc}")
+        return None
+
+
+def dump(namespace, key, value) -> None:
+    """Writes a value to the cache
+
+    The value is serialized to a temporary file in the cache directory
+    which is then renamed over the cache entry.  Since the rename is
+    atomic, concurrent writers and readers are safe.  Failures to write
+    the cache are logged and otherwise ignored.
+
+    Args:
+        namespace (str): The cache namespace
+        key (str): The key that identifies the cache entry
+        value (any): The value to cache.  Must be serializable by `marshal`
+
+    Returns:
+        None
+    """
+    path = filename(namespace, key)
+    if path is None:
+        return
+
+    tmp = None
+
+    try:
+        dirname = os.path.dirname(path)
+        os.makedirs(dirname, mode=0o700, exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=dirname, prefix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            marshal.dump(value, f)
+
+        os.replace(tmp, path)
+        tmp = None
+
+    except (OSError, ValueError) as exc:
+        display.vvvv(f"unable to write cache entry {path}: {exc}")
+
+    finally:
+        if tmp is not None:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+
+def prune(namespace, max_age=None, max_bytes=None) -> int:
+    """Removes old entries from a cache namespace
+
+    Entries that were written more than `max_age` seconds ago are
+    removed first.  If the remaining entries are larger than
+    `max_bytes`, the oldest entries are removed until they fit.
+    Entries removed concurrently by another process are ignored.
+
+    Args:
+        namespace (str): The cache namespace
+        max_age (float): The maximum age of an entry in seconds.  If
+            None, entries are not removed because of their age
+        max_bytes (int): The maximum total size of the entries.  If
+            None, entries are not removed because of their size
+
+    Returns:
+        The number of entries removed
+    """
+    path = directory(namespace)
+    if path is None:
+        return 0
+
+    entries = list()
+
+    try:
+        with os.scandir(path) as items:
+            for item in items:
+                try:
+                    info = item.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, item.path))
+    except OSError:
+        return 0
+
+    entries.sort()
+
+    now = time.time()
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+
+    for mtime, size, name in entries:
+        expired = max_age is not None and now - mtime > max_age
+        oversized = max_bytes is not None and total > max_bytes
+
+        if not expired and not oversized:
+            break
+
+        try:
+            os.unlink(name)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            display.vvvv(f"unable to remove cache entry {name}: {exc}")
+            continue
+
+        total -= size
+
+    return removed
@@ -0,0 +1,495 @@
+# Copyright 2024, Itential Inc. All Rights Reserved
+
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import json
+import time
+import fcntl
+import base64
+import typing
+import hashlib
+import tempfile
+import threading
+import contextlib
+import urllib.parse
+
+import requests
+
+from dataclasses import dataclass, field, asdict
+from http.cookiejar import Cookie
+
+from ansible.errors import AnsibleError
+
+from ansible_collections.itential.core.plugins.module_utils import cache
+from ansible_collections.itential.core.plugins.module_utils import display
+from ansible_collections.itential.core.plugins.module_utils import http
+
+
+# number of seconds before a credential expires that it is treated as
+# expired so it is not used for a request that would arrive too late
+SKEW = 30
+
+
+_stores = {}
+
+
+def directory() -> str:
+    """Returns the directory that holds the credential files
+
+    The credentials are stored in the `credentials` namespace of the
+    on-disk cache when `ITENTIAL_CACHE_DIR` is set, otherwise in a
+    per-user directory under the system temporary directory.
+
+    Returns:
+        The path to the directory
+    """
+    return cache.directory("credentials") or os.path.join(
+        tempfile.gettempdir(), f"itential-{os.getuid()}", "credentials"
+    )
+
+
+@dataclass
+class Credential(object):
+    """Credential holds the authentication state for a host and user
+
+    Args:
+        headers (dict): The headers to send with every request, for
+            instance the `Authorization` header with the token
+
+        cookies (dict): The cookies to send with every request to the
+            host
+
+        expires (float): The time, in seconds since the epoch, the
+            credential expires.  If None, the credential is used until
+            the server rejects it
+    """
+    headers: dict = field(default_factory=dict)
+    cookies: dict = field(default_factory=dict)
+    expires: float = None
+
+    def valid(self, skew=SKEW) -> bool:
+        """Returns True if the credential has not expired
+
+        Args:
+            skew (float): The number of seconds before the expiration
+                time that the credential is treated as expired
+
+        Returns:
+            True if the credential can be used
+        """
+        return self.expires is None or time.time() + skew < self.expires
+
+
+class MemoryStore(object):
+    """MemoryStore keeps credentials in memory for the life of the process
+
+    The MemoryStore object implements the same interface as `FileStore`
+    and can be used when credentials must not be written to disk.
+    """
+    def __init__(self):
+        self.entries = dict()
+        self.locks = dict()
+        self.guard = threading.Lock()
+
+    def get(self, host, username) -> Credential:
+        """Returns the credential for host and username
+
+        Args:
+            host (str): The host the credential is used with
+            username (str): The user the credential belongs to
+
+        Returns:
+            A `Credential` object or None if there is no credential
+        """
+        return self.entries.get((host, username))
+
+    def put(self, host, username, credential) -> None:
+        """Stores the credential for host and username
+
+        Args:
+            host (str): The host the credential is used with
+            username (str): The user the credential belongs to
+            credential (Credential): The credential to store
+
+        Returns:
+            None
+        """
+        self.entries[(host, username)] = credential
+
+    def delete(self, host, username) -> None:
+        """Removes the credential for host and username
+
+        Args:
+            host (str): The host the credential is used with
+            username (str): The user the credential belongs to
+
+        Returns:
+            None
+        """
+        self.entries.pop((host, username), None)
+
+    @contextlib.contextmanager
+    def lock(self, host, username) -> typing.Iterator[None]:
+        """Holds an exclusive lock for host and username
+
+        Args:
+            host (str): The host the credential is used with
+            username (str): The user the credential belongs to
+
+        Returns:
+            A context manager that releases the lock on exit
+        """
+        with self.guard:
+            item = self.locks.setdefault((host, username), threading.Lock())
+        with item:
+            yield
+
+
+class FileStore(object):
+    """FileStore keeps credentials in files shared across processes
+
+    Each credential is stored as a JSON document in its own file named
+    after a hash of the host and username.  The directory is created
+    with mode 0700, see `cache.makedirs`, and the files with mode 0600
+    so only the current user can read them.  Files are replaced
+    atomically and a separate lock file per credential lets one process
+    log in while the others wait for the new credential.
+
+    Args:
+        path (str): The directory that holds the credential files.  If
+            None, the value returned by `directory` is used
+    """
+    def __init__(self, path=None):
+        self.path = path or directory()
+
+        cache.makedirs(self.path)
+
+    def filename(self, host, username) -> str:
+        """Returns the path to the credential file
+
+        Args:
+            host (str): The host the credential is used with
+            username (str): The user the credential belongs to
+
+        Returns:
+            The path to the file
+        """
+        digest = hashlib.sha256(f"{host}\n{username}".encode("utf-8")).hexdigest()
+        return os.path.join(self.path, digest)
+
+    def get(self, host, username) -> Credential:
+        """Returns the credential for host and username
+
+        Any file that cannot be read is treated as a missing credential.
+
+        Args:
+            host (str): The host the credential is used with
+            username (str): The user the credential belongs to
+
+        Returns:
+            A `Credential` object or None if there is no credential
+        """
+        path = self.filename(host, username)
+
+        try:
+            with open(path, "rb") as f:
+                return Credential(**json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as exc:
+            display.vvvv(f"unable to read credential file {path}: {exc}")
+            return None
+
+    def put(self, host, username, credential) -> None:
+        """Stores the credential for host and username
+
+        Failures to write the file are logged and otherwise ignored since
+        the credential is still used by the current session.
+
+        Args:
+            host (str): The host the credential is used with
+            username (str): The user the credential belongs to
+            credential (Credential): The credential to store
+
+        Returns:
+            None
+        """
+        path = self.filename(host, username)
+
+        tmp = None
+
+        try:
+            # mkstemp creates the file with mode 0600
+            fd, tmp = tempfile.mkstemp(dir=self.path, prefix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(asdict(credential), f)
+
+            os.replace(tmp, path)
+            tmp = None
+
+        except (OSError, TypeError, ValueError) as exc:
+            display.vvvv(f"unable to write credential file {path}: {exc}")
+
+        finally:
+            if tmp is not None:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+
+    def delete(self, host, username) -> None:
+        """Removes the credential for host and username
+
+        Args:
+            host (str): The host the credential is used with
+            username (str): The user the credential belongs to
+
+        Returns:
+            None
+        """
+        try:
+            os.unlink(self.filename(host, username))
+        except FileNotFoundError:
+            pass
+
+    @contextlib.contextmanager
+    def lock(self, host, username) -> typing.Iterator[None]:
+        """Holds an exclusive lock for host and username
+
+        The lock is held on a separate file so that readers are never
+        blocked.  Each call opens the lock file so the lock also excludes
+        other threads in the same process.
+
+        Args:
+            host (str): The host the credential is used with
+            username (str): The user the credential belongs to
+
+        Returns:
+            A context manager that releases the lock on exit
+        """
+        fd = os.open(f"{self.filename(host, username)}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+
+def filestore(path=None) -> FileStore:
+    """Returns the file store for path
+
+    The store object is cached per process for each path.
+
+    Args:
+        path (str): The directory that holds the credential files
+
+    Returns:
+        A `FileStore` object
+    """
+    path = path or directory()
+
+    item = _stores.get(path)
+
+    if item is None:
+        item = FileStore(path)
+        _stores[path] = item
+
+    return item
+
+
+class Authenticator(object):
+    """Authenticator logs in to a host and reuses the credential
+
+    The Authenticator object looks up the credential for the host and
+    username in the store before logging in.  A new login is only
+    performed when there is no credential, the credential has expired
+    or the server rejected it with a 401.  The store lock is held while
+    logging in and the store is checked again once the lock is acquired
+    so concurrent workers share a single login.
+
+    Args:
+        host (str): The host to authenticate with
+
+        username (str): The user to authenticate as
+
+        login (callable): Called with the `http.Session` to log in and
+            returns a `Credential`.  See `login` and `basic`
+
+        store (object): The credential store.  If None, the default
+            `FileStore` is used, see `filestore`
+    """
+    def __init__(self, host, username, login, store=None):
+        self.host = host
+        self.username = username
+        self.login = login
+        self.store = store if store is not None else filestore()
+        self.current = None
+
+    def apply(self, session, stale=None) -> Credential:
+        """Ensures the session holds a valid credential
+
+        Args:
+            session (http.Session): The session to authenticate
+
+            stale (Credential): A credential the server rejected.  If the
+                stored credential is the same, a new login is performed
+
+        Returns:
+            The `Credential` object applied to the session
+        """
+        if stale is None and self.current is not None and self.current.valid():
+            return self.current
+
+        credential = self.store.get(self.host, self.username)
+
+        if not self.usable(credential, stale):
+            with self.store.lock(self.host, self.username):
+                # another worker may have logged in while waiting for
+                # the lock
+                credential = self.store.get(self.host, self.username)
+
+                if not self.usable(credential, stale):
+                    display.vvv(f"logging in to {self.host} as {self.username}")
+                    credential = self.login(session)
+                    self.store.put(self.host, self.username, credential)
+
+        session.session.headers.update(credential.headers)
+
+        for name, value in credential.cookies.items():
+            session.session.cookies.set_cookie(self.cookie(name, value))
+
+        self.current = credential
+
+        return credential
+
+    def cookie(self, name, value) -> Cookie:
+        """Returns a cookie that is only sent to the host
+
+        Args:
+            name (str): The name of the cookie
+            value (str): The value of the cookie
+
+        Returns:
+            A `Cookie` object
+        """
+        hostname = urllib.parse.urlsplit(f"//{self.host}").hostname or self.host
+
+        # the cookie jar stores cookies for hosts without a dot, such as
+        # localhost, under the .local suffix
+        if "." not in hostname:
+            hostname = f"{hostname}.local"
+
+        item = requests.cookies.create_cookie(name, value, domain=hostname)
+        item.domain_specified = False
+
+        return item
+
+    def usable(self, credential, stale) -> bool:
+        """Returns True if credential can be applied to the session
+
+        Args:
+            credential (Credential): The stored credential or None
+            stale (Credential): A credential the server rejected or None
+
+        Returns:
+            True if the credential is valid and was not rejected
+        """
+        return credential is not None and credential.valid() and credential != stale
+
+    def invalidate(self) -> None:
+        """Removes the credential from the store
+
+        Returns:
+            None
+        """
+        self.store.delete(self.host, self.username)
+        self.current = None
+
+
+def basic(username, password) -> dict:
+    """Returns the headers for HTTP basic authentication
+
+    The headers can be set on the login `Request` for APIs that accept
+    basic authentication on a login endpoint and return a token or
+    cookie for later requests.
+
+    Args:
+        username (str): The username to use when authenticating
+        password (str): The password to use when authenticating
+
+    Returns:
+        A dict object with the `Authorization` header
+    """
+    value = base64.b64encode(f"{username}:{password}".encode("utf-8")).decode("ascii")
+    return {"Authorization": f"Basic {value}"}
+
+
+def login(request, token=None, header="Authorization", scheme="Bearer", ttl=None) -> typing.Callable:
+    """Returns a login function for `Authenticator`
+
+    The login function sends the request and builds the credential
+    from the response.  Any cookies set by the server are saved with
+    the credential.  If `token` is set, the token is read from the
+    response and sent in `header` on later requests.
+
+    Args:
+        request (http.Request): The login request
+
+        token (str): The dotted key of the token in the JSON response
+            body.  Use an empty string when the body is the token
+
+        header (str): The header used to send the token
+
+        scheme (str): The prefix for the token in the header.  If None,
+            the token is sent as is
+
+        ttl (float): The number of seconds the credential is valid.  If
+            None, the `expires_in` value in the response body is used
+            if present
+
+    Returns:
+        A function that accepts an `http.Session` and returns a `Credential`
+    """
+    def func(session) -> Credential:
+        display.trace("credentials.login")
+
+        url = http.make_url(request.host, request.path, request.port, request.use_tls)
+
+        resp = session._send(request, url)
+
+        if resp.status_code >= 400:
+            raise AnsibleError(f"Failed to log in to {url}: {resp.status_code} {resp.status}")
+
+        data = None
+        if resp.body and (token or ttl is None):
+            try:
+                data = resp.json()
+            except ValueError:
+                data = None
+
+        headers = dict()
+
+        if token is not None:
+            value = resp.text.strip() if token == "" else http.lookup(data, token)
+            if not value:
+                raise AnsibleError(f"Failed to log in to {url}: token not found in response")
+            headers[header] = f"{scheme} {value}" if scheme else str(value)
+
+        lifetime = ttl
+        if lifetime is None and isinstance(data, dict):
+            lifetime = data.get("expires_in")
+
+        expires = None
+        if lifetime is not None:
+            expires = time.time() + float(lifetime)
+
+        return Credential(
+            headers=headers,
+            cookies=session.session.cookies.get_dict(),
+            expires=expires,
+        )
+
+    return func
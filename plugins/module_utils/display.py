@@ -4,10 +4,24 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import os
-
+import json
+import time
+import atexit
+import typing
+import functools
+import itertools
+import threading
+import contextvars
+import concurrent.futures
+
+from ansible import constants as C
 from ansible.utils.display import Display
 
 
+TRACE_FILE_ENV = "ITENTIAL_TRACE_FILE"
+TRACE_FORMAT_ENV = "ITENTIAL_TRACE_FORMAT"
+
+
 display = Display()
 
 
@@ -26,15 +40,37 @@ def set_verbosity(lvl) -> None:
             display.verbosity = lvl
 
 
-def tostring(msg) -> None:
+def enabled(lvl) -> bool:
+    """Checks if messages at the verbosity level will be displayed or logged
+
+    Ansible writes verbose messages to the log file when the log
+    verbosity, see `ANSIBLE_LOG_VERBOSITY`, is higher than the display
+    verbosity so a level is enabled if either one includes it.
+
+    Args:
+        lvl (int): The verbosity level to check
+
+    Returns:
+        A boolean indicating if the verbosity level is enabled
+    """
+    return max(display.verbosity, getattr(display, "log_verbosity", 0) or 0) >= lvl
+
+
+def tostring(msg) -> str:
     """Ensures the passed message is a string
 
+    If msg is callable, it is invoked and its return value is used as
+    the message.  This allows callers to defer building expensive
+    messages until they are known to be displayed.
+
     Args:
         msg (str) -> None: The message to display
 
     Returns:
-        None
+        The message as a string
     """
+    if callable(msg):
+        msg = msg()
     return str(msg)
 
 
@@ -42,91 +78,112 @@ def v(msg, host=None) -> None:
     """Display message to stdout when verbosity is set to 1
 
     Args:
-        msg (str): The message to display
+        msg (str): The message to display or a callable that returns
+            the message.  The callable is only invoked when the verbosity
+            level is enabled
         host (str): The host associated with this message
 
     Returns:
         None
     """
-    display.v(tostring(msg), host)
+    if enabled(1):
+        display.v(tostring(msg), host)
 
 
 def vv(msg, host=None) -> None:
     """Display message to stdout when verbosity is set to 2
 
     Args:
-        msg (str): The message to display
+        msg (str): The message to display or a callable that returns
+            the message.  The callable is only invoked when the verbosity
+            level is enabled
         host (str): The host associated with this message
 
     Returns:
         None
     """
-    display.vv(tostring(msg), host)
+    if enabled(2):
+        display.vv(tostring(msg), host)
 
 
 def vvv(msg, host=None) -> None:
     """Display message to stdout when verbosity is set to 3
 
     Args:
-        msg (str): The message to display
+        msg (str): The message to display or a callable that returns
+            the message.  The callable is only invoked when the verbosity
+            level is enabled
         host (str): The host associated with this message
 
     Returns:
         None
     """
-    display.vvv(tostring(msg), host)
+    if enabled(3):
+        display.vvv(tostring(msg), host)
 
 
 def vvvv(msg, host=None) -> None:
     """Display message to stdout when verbosity is set to 4
 
     Args:
-        msg (str): The message to display
+        msg (str): The message to display or a callable that returns
+            the message.  The callable is only invoked when the verbosity
+            level is enabled
         host (str): The host associated with this message
 
     Returns:
         None
     """
-    display.vvvv(tostring(msg), host)
+    if enabled(4):
+        display.vvvv(tostring(msg), host)
 
 
 def vvvvv(msg, host=None) -> None:
     """Display message to stdout when verbosity is set to 5
 
     Args:
-        msg (str): The message to display
+        msg (str): The message to display or a callable that returns
+            the message.  The callable is only invoked when the verbosity
+            level is enabled
         host (str): The host associated with this message
 
     Returns:
         None
     """
-    display.vvvvv(tostring(msg), host)
+    if enabled(5):
+        display.vvvvv(tostring(msg), host)
 
 
 def vvvvvv(msg, host=None) -> None:
     """Display message to stdout when verbosity is set to 6
 
     Args:
-        msg (str): The message to display
+        msg (str): The message to display or a callable that returns
+            the message.  The callable is only invoked when the verbosity
+            level is enabled
         host (str): The host associated with this message
 
     Returns:
         None
     """
-    display.vvvvvv(tostring(msg), host)
+    if enabled(6):
+        display.vvvvvv(tostring(msg), host)
 
 
 def debug(msg, host=None) -> None:
     """Display message to stdout when debug is enabled
 
     Args:
-        msg (str): The message to display
+        msg (str): The message to display or a callable that returns
+            the message.  The callable is only invoked when debug is
+            enabled
         host (str): The host associated with this message
 
     Returns:
         None
     """
-    display.debug(tostring(msg), host)
+    if C.DEFAULT_DEBUG:
+        display.debug(tostring(msg), host)
 
 
 def error(msg, host=None) -> None:
@@ -158,10 +215,325 @@ def trace(msg, host=None) -> None:
     """Display trace messsages to stdout
 
     Args:
-        msg (str): The message to display
+        msg (str): The message to display or a callable that returns
+            the message.  The callable is only invoked when the verbosity
+            level is enabled
         host (str): The host associated with this message
 
     Returns:
         None
     """
-    display.vvvvv(f"TRACE {msg}", host=host)
+    if enabled(5):
+        display.vvvvv(f"TRACE {tostring(msg)}", host=host)
+
+
+class NoopSpan(object):
+    """NoopSpan is the span returned when tracing is disabled
+
+    A single instance is shared by every caller so that creating,
+    entering and updating a span does nothing when tracing is off.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attributes) -> None:
+        pass
+
+
+NOOP = NoopSpan()
+
+
+class Span(object):
+    """Span measures a named operation
+
+    Spans are used as context managers.  The span started while
+    another span is active becomes its child.  The start and end times
+    are taken from the monotonic clock which is shared by all processes
+    on the host so spans from forked workers line up.
+
+    Args:
+        name (str): The name of the operation
+        attributes (dict): Key value pairs that describe the operation,
+            for instance the host, URL or status code
+    """
+    __slots__ = ("name", "attributes", "id", "parent", "start", "end", "token")
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.id = None
+        self.parent = None
+        self.start = None
+        self.end = None
+        self.token = None
+
+    def __enter__(self):
+        parent = _current.get()
+        self.parent = parent.id if parent is not None else None
+        self.id = next(_ids)
+        self.token = _current.set(self)
+        self.start = time.monotonic_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.monotonic_ns()
+        _current.reset(self.token)
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        if _exporter is not None:
+            _exporter.export(self)
+        return False
+
+    def set(self, **attributes) -> None:
+        """Adds attributes to the span
+
+        Args:
+            attributes (dict): Key value pairs to add to the span
+
+        Returns:
+            None
+        """
+        self.attributes.update(attributes)
+
+
+class Exporter(object):
+    """Exporter writes finished spans to a local file
+
+    Spans are buffered in memory and appended to the file when a span
+    without a parent ends, when the buffer is full or when
+    the process exits.  Each flush is a single append so the file can
+    be shared by forked workers.
+
+    The `jsonl` format writes one JSON document per span.  The `chrome`
+    format writes trace events that can be opened with a trace viewer
+    such as `chrome://tracing` or Perfetto.
+
+    Args:
+        path (str): The path to the trace file
+        format (str): The file format, either `jsonl` or `chrome`
+        size (int): The number of spans to buffer before writing
+    """
+    def __init__(self, path, format="jsonl", size=256):
+        if format not in ("jsonl", "chrome"):
+            raise ValueError(f"invalid trace format: {format}")
+
+        self.path = path
+        self.format = format
+        self.size = size
+        self.lock = threading.Lock()
+        self.buffer = list()
+
+    def export(self, span) -> None:
+        """Adds a finished span to the buffer
+
+        Args:
+            span (Span): The finished span
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.buffer.append((span, os.getpid(), threading.get_ident()))
+            full = len(self.buffer) >= self.size
+
+        if full or span.parent is None:
+            self.flush()
+
+    def encode(self, span, pid, tid) -> str:
+        """Encodes a span as a line in the trace file
+
+        Args:
+            span (Span): The finished span
+            pid (int): The process that recorded the span
+            tid (int): The thread that recorded the span
+
+        Returns:
+            The encoded span
+        """
+        if self.format == "chrome":
+            return json.dumps({
+                "name": span.name,
+                "ph": "X",
+                "ts": span.start / 1000,
+                "dur": (span.end - span.start) / 1000,
+                "pid": pid,
+                "tid": tid,
+                "args": span.attributes,
+            }, default=str) + ",\n"
+
+        return json.dumps({
+            "name": span.name,
+            "id": f"{pid}-{span.id}",
+            "parent": f"{pid}-{span.parent}" if span.parent is not None else None,
+            "start": span.start,
+            "end": span.end,
+            "duration": span.end - span.start,
+            "pid": pid,
+            "tid": tid,
+            "attributes": span.attributes,
+        }, default=str) + "\n"
+
+    def flush(self) -> None:
+        """Appends the buffered spans to the trace file
+
+        Returns:
+            None
+        """
+        with self.lock:
+            items, self.buffer = self.buffer, list()
+
+        if not items:
+            return
+
+        data = "".join(self.encode(*item) for item in items).encode("utf-8")
+
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                # the chrome trace format allows the closing bracket of
+                # the event array to be omitted so events can be appended
+                if self.format == "chrome" and os.fstat(fd).st_size == 0:
+                    data = b"[\n" + data
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+        except OSError as exc:
+            display.warning(f"unable to write trace file {self.path}: {exc}")
+
+
+_current = contextvars.ContextVar("itential_span", default=None)
+_ids = itertools.count(1)
+_exporter = None
+
+
+def configure(path=None, format=None) -> None:
+    """Enables or disables tracing
+
+    Tracing is configured from the `ITENTIAL_TRACE_FILE` and
+    `ITENTIAL_TRACE_FORMAT` environment variables when this module is
+    imported.  When no format is given, `chrome` is used for files that
+    end with `.json` and `jsonl` otherwise.
+
+    Args:
+        path (str): The path to the trace file.  If None, tracing is
+            disabled
+        format (str): The file format, either `jsonl` or `chrome`
+
+    Returns:
+        None
+    """
+    global _exporter
+
+    if _exporter is not None:
+        _exporter.flush()
+
+    if not path:
+        _exporter = None
+        return
+
+    if not format:
+        format = "chrome" if path.endswith(".json") else "jsonl"
+
+    _exporter = Exporter(path, format)
+
+
+def tracing() -> bool:
+    """Checks if spans are recorded
+
+    Returns:
+        A boolean indicating if tracing is enabled
+    """
+    return _exporter is not None
+
+
+def span(name, **attributes) -> typing.Any:
+    """Creates a span for a named operation
+
+    The span is used as a context manager.  When tracing is disabled a
+    shared no-op span is returned.
+
+    Args:
+        name (str): The name of the operation
+        attributes (dict): Key value pairs that describe the operation
+
+    Returns:
+        A `Span` object or `NOOP`
+    """
+    if _exporter is None:
+        return NOOP
+    return Span(name, attributes)
+
+
+def current() -> typing.Any:
+    """Returns the active span
+
+    Returns:
+        The innermost active `Span` object or `NOOP` if no span is active
+    """
+    if _exporter is None:
+        return NOOP
+    return _current.get() or NOOP
+
+
+def traced(name=None) -> typing.Callable:
+    """Decorator that records a span for each call of a function
+
+    Args:
+        name (str): The name of the span.  If None, the qualified name
+            of the function is used
+
+    Returns:
+        The decorator
+    """
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _exporter is None:
+                return func(*args, **kwargs)
+            with Span(label, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def submit(executor, func, *args, **kwargs) -> concurrent.futures.Future:
+    """Submits a call to an executor in a copy of the current context
+
+    Executor threads do not inherit context variables from the thread
+    that submits the call.  The call runs in a copy of the submitter's
+    context so the spans it starts are children of the active span.
+
+    Args:
+        executor (concurrent.futures.Executor): The executor that runs the call
+        func (callable): The function to call
+        args (tuple): The positional arguments for the call
+        kwargs (dict): The keyword arguments for the call
+
+    Returns:
+        A `concurrent.futures.Future` object for the call
+    """
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+def flush() -> None:
+    """Writes any buffered spans to the trace file
+
+    Returns:
+        None
+    """
+    if _exporter is not None:
+        _exporter.flush()
+
+
+configure(os.environ.get(TRACE_FILE_ENV), os.environ.get(TRACE_FORMAT_ENV))
+
+atexit.register(flush)
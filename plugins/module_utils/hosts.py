@@ -3,23 +3,210 @@
 # GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-import importlib
+import difflib
 import collections
 import typing
 
+from dataclasses import dataclass
+
 from ansible.errors import AnsibleError
-from ansible.module_utils.common import yaml
 
+from ansible_collections.itential.core.plugins.module_utils import args
 from ansible_collections.itential.core.plugins.module_utils import display
+from ansible_collections.itential.core.plugins.module_utils import profiler
+
+
+_classes = {}
+_specs = {}
+_ids = {}
+
+
+def hosttype(name, fields) -> type:
+    """Returns the immutable host class for name and fields
+
+    The class is created the first time a name and set of fields is
+    requested and cached for the life of the process.  The class is a
+    `namedtuple` which defines empty `__slots__` so instances carry no
+    per-instance `__dict__`.
+
+    Args:
+        name (str): The name of the host class
+        fields (tuple): The names of the host properties
+
+    Returns:
+        The host class
+    """
+    key = (name, fields)
+
+    cls = _classes.get(key)
+
+    if cls is None:
+        cls = collections.namedtuple(name, fields)
+        _classes[key] = cls
+
+    return cls
+
+
+class Spec(object):
+    """Spec is the compiled form of a host schema
+
+    The Spec object precomputes the metadata for each host property
+    once so that building a host object does not need to walk the
+    raw schema.
+
+    Args:
+        cls (type): The immutable host class
+        properties (tuple): A tuple of entries, one per host property,
+            that holds the field name, the host vars to search in
+            order, the default value, whether the field is required,
+            the field data type, the set of valid choices and the
+            choices formatted for error messages
+        index (dict): Maps each host var name to a tuple of
+            (position, priority) entries, one for each property that
+            reads the var, where priority is the index of the var in
+            the property `vars` list
+        suggestions (dict): Memoizes the closest known var name for
+            unknown `itential_*` vars
+    """
+    def __init__(self, spec):
+        options = spec.get("options")
+
+        properties = list()
+        index = dict()
+
+        for position, (field, item) in enumerate(options.items()):
+            for priority, var in enumerate(item.get("vars") or ()):
+                index[var] = index.get(var, ()) + ((position, priority),)
+
+            choices = item.get("choices")
+            properties.append((
+                field,
+                tuple(item.get("vars") or ()),
+                item.get("default"),
+                item.get("required") is True,
+                args.TYPES.get(item.get("type") or "str"),
+                frozenset(choices) if choices else None,
+                ", ".join(str(c) for c in choices) if choices else None,
+            ))
+
+        name = spec.get("name").title().replace(".", "")
+
+        self.cls = hosttype(name, tuple(options))
+        self.properties = tuple(properties)
+        self.index = index
+        self.suggestions = dict()
+
+    def lookup(self, hostvars) -> list:
+        """Finds the value of every property in hostvars
+
+        The lookup makes a single pass over the smaller of the host vars
+        or the var index.  For each property, the value of the first var
+        in its `vars` list that is set is returned.
+
+        Args:
+            hostvars (dict): A dictionary of variables for the host
+
+        Returns:
+            A list with the value for each property or None if the
+            property is not set
+        """
+        values = [None] * len(self.properties)
+        ranks = [None] * len(self.properties)
+
+        if len(hostvars) < len(self.index):
+            for key in hostvars:
+                for position, priority in self.index.get(key, ()):
+                    if ranks[position] is None or priority < ranks[position]:
+                        value = hostvars.get(key)
+                        if value is not None:
+                            values[position] = value
+                            ranks[position] = priority
+        else:
+            for key, entries in self.index.items():
+                value = None
+                for position, priority in entries:
+                    if ranks[position] is None or priority < ranks[position]:
+                        if value is None:
+                            value = hostvars.get(key)
+                            if value is None:
+                                break
+                        values[position] = value
+                        ranks[position] = priority
+
+        return values
+
+    def typos(self, hostvars) -> dict:
+        """Finds unknown `itential_*` vars that look like typos
+
+        Args:
+            hostvars (dict): A dictionary of variables for the host
+
+        Returns:
+            A dict object that maps each unknown var to the known var
+            name it most closely matches
+        """
+        found = dict()
+
+        for key in hostvars:
+            if key.startswith("itential_") and key not in self.index:
+                if key not in self.suggestions:
+                    known = [var[9:] for var in self.index if var.startswith("itential_")]
+                    matches = difflib.get_close_matches(key[9:], known, n=1, cutoff=0.7)
+                    self.suggestions[key] = f"itential_{matches[0]}" if matches else None
+                if self.suggestions[key] is not None:
+                    found[key] = self.suggestions[key]
+
+        return found
+
+
+def load(spec) -> Spec:
+    """Returns the compiled host spec
+
+    The compiled spec is found by the identity of the schema object so
+    the schema is only converted to a string, to find an equal schema
+    that was already compiled, the first time an object is seen.  A
+    reference to the schema is kept so its id is never reused.
+
+    Args:
+        spec (dict): The host schema
+
+    Returns:
+        A `Spec` object for the host schema
+    """
+    entry = _ids.get(id(spec))
+
+    if entry is not None and entry[0] is spec:
+        return entry[1]
+
+    key = repr(spec)
+
+    compiled = _specs.get(key)
+
+    if compiled is None:
+        compiled = Spec(spec)
+        _specs[key] = compiled
 
+    # a caller that builds a new schema object for each host would
+    # otherwise keep every object alive
+    if len(_ids) >= 1024:
+        _ids.clear()
 
+    _ids[id(spec)] = (spec, compiled)
+
+    return compiled
+
+
+@display.traced("hosts.new")
+@profiler.timed("hosts.new")
 def new(spec, hostvars) -> typing.Any:
     """Create a new instance of a host
 
-    The `new` function will dynamically create a new class object and
-    instantiate it with the values provided by hostvars.   This will
+    The `new` function will create a new instance of the host class
+    and instantiate it with the values provided by hostvars.   This will
     take the host properties from inventory and return an immutable
-    instance that represents the host based on the host schema.
+    instance that represents the host based on the host schema.  The
+    host class and schema metadata are only computed the first time a
+    schema is used.
 
     Args:
         name (str): The name of the host class schema
@@ -29,52 +216,163 @@ def new(spec, hostvars) -> typing.Any:
         An immutable instance that represents the host
     """
     display.trace("hosts.new")
+    display.current().set(host=hostvars.get("inventory_hostname"))
 
     verbosity = hostvars.get("itential_verbosity")
     if verbosity is not None:
         if hostvars.get("ansible_verbosity") < verbosity:
             display.set_verbosity(verbosity)
 
-    options = spec.get("options")
+    compiled = load(spec)
 
-    values = dict()
-    fields = list()
+    if display.enabled(3):
+        for key, match in compiled.typos(hostvars).items():
+            display.vvv(f"unknown host variable {key}, did you mean {match}?")
 
-    for field, properties in options.items():
+    return compiled.cls._make([
+        check(item, value) for item, value in zip(compiled.properties, compiled.lookup(hostvars))
+    ])
 
-        fields.append(field)
-        value = None
 
-        for item in (properties.get("vars") or list()):
-            value = hostvars.get(item)
-            if value is not None:
-                break
-        else:
-            value = properties.get("default")
-            if value is None and properties.get("required") is True:
-                raise AnsibleError(f"missing required property: itential_{field}")
+def typos(spec, hostvars) -> dict:
+    """Finds unknown `itential_*` host vars that look like typos
+
+    Args:
+        spec (dict): The host schema
+        hostvars (dict): A dictionary of variables for the host
+
+    Returns:
+        A dict object that maps each unknown var to the known var
+        name it most closely matches
+    """
+    return load(spec).typos(hostvars)
+
+
+def resolve(properties, hostvars) -> typing.Any:
+    """Resolves the value of a single host property from hostvars
+
+    Args:
+        properties (tuple): The compiled property entry from `Spec.properties`
+        hostvars (dict): A dictionary of variables for the host
+
+    Returns:
+        The value of the property or None
 
-        values[field] = value
+    Raises:
+        AnsibleError: If the value is missing or not valid
+    """
+    value = None
 
+    for item in properties[1]:
+        value = hostvars.get(item)
         if value is not None:
-            field_type = properties.get("type") or "str"
+            break
+
+    return check(properties, value)
+
+
+def check(properties, value) -> typing.Any:
+    """Applies the default and validates the value of a host property
+
+    Args:
+        properties (tuple): The compiled property entry from `Spec.properties`
+        value (any): The value found in the host vars or None
+
+    Returns:
+        The value of the property or None
+
+    Raises:
+        AnsibleError: If the value is missing or not valid
+    """
+    field, names, default, required, datatype, choices, text = properties
+
+    if value is None:
+        value = default
+        if value is None and required:
+            raise AnsibleError(f"missing required property: itential_{field}")
+
+    if value is not None:
+        if datatype is None or not isinstance(value, datatype):
+            raise AnsibleError(f"invalid data type for {field}")
+
+        if choices is not None and not args.contains(choices, value):
+            raise AnsibleError(
+                f"invalid value for {field}, expected one of {text}, got {value}"
+            )
+
+    return value
+
+
+@dataclass
+class Batch(object):
+    """Batch represents a set of hosts built from a single schema
+
+    The Batch object holds the host properties in columns, one list per
+    field, with one entry per host in the order the hosts were provided.
+
+    Args:
+        cls (type): The immutable host class
+
+        columns (dict): Maps each field name to the list of values for
+            that field.  The value is None for any host where the field
+            could not be resolved
+
+        errors (list): One list of error messages per host.  The list
+            is empty if the host is valid
+    """
+    cls: type
+    columns: dict
+    errors: list
+
+    def hosts(self) -> list:
+        """Returns the host objects for the batch
+
+        Returns:
+            A list with one immutable host instance per host or None for
+            any host that has errors
+        """
+        rows = zip(*self.columns.values()) if self.columns else ((),) * len(self.errors)
+        return [
+            None if errors else self.cls._make(row)
+            for row, errors in zip(rows, self.errors)
+        ]
+
+
+def batch(spec, hostvars) -> Batch:
+    """Builds the host properties for many hosts at once
+
+    The `batch` function resolves every host in hostvars against a single
+    host schema.  The schema is compiled once and the properties are
+    resolved one field at a time across all hosts.  A host that fails
+    validation does not stop the batch, instead the errors are recorded
+    for that host.  Unlike `new`, this function does not change the
+    verbosity level.
+
+    Args:
+        spec (dict): The host schema
+        hostvars (iterable): An iterable of dictionaries, one per host
+
+    Returns:
+        A `Batch` object
+    """
+    display.trace("hosts.batch")
+
+    compiled = load(spec)
 
-            if (field_type == "bool" and isinstance(value, bool)) or \
-                (field_type == "int" and isinstance(value, int)) or \
-                (field_type == "dict" and isinstance(value, dict)) or \
-                (field_type == "list" and isinstance(value, list)) or \
-                (field_type == "str" and isinstance(value, str)):
-                    values[field] = value
-            else:
-                raise AnsibleError(f"invalid data type for {field}")
+    hostvars = list(hostvars)
+    errors = [list() for _ in hostvars]
+    columns = dict()
 
-            choices = properties.get("choices")
+    for properties in compiled.properties:
+        column = list()
 
-            if choices and value not in choices:
-                raise AnsibleError(
-                    f"invalid value for {field}, expected one of {', '.join(choices)}, got {value}"
-                )
+        for index, item in enumerate(hostvars):
+            try:
+                column.append(resolve(properties, item))
+            except AnsibleError as exc:
+                column.append(None)
+                errors[index].append(str(exc))
 
-    name = spec.get("name").title().replace(".", "")
+        columns[properties[0]] = column
 
-    return collections.namedtuple(name, fields)(**values)
+    return Batch(compiled.cls, columns, errors)
@@ -3,247 +3,2743 @@
 # GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import os
+import re
+import ssl
 import json
+import time
+import email
+import random
+import codecs
+import datetime
+import typing
+import asyncio
+import hashlib
 import urllib3
+import zlib
+import tempfile
+import itertools
+import collections
+import dataclasses
+import threading
 import traceback
 import functools
 
+import http.cookiejar
 import urllib.parse
+import urllib.request
+import email.utils
+import email.parser
+import email.policy
+import email.message
+import concurrent.futures
 
 from dataclasses import dataclass, field
 
 from ansible.errors import AnsibleError
 
+from ansible_collections.itential.core.plugins.module_utils import cache
 from ansible_collections.itential.core.plugins.module_utils import display
+from ansible_collections.itential.core.plugins.module_utils import metrics
+from ansible_collections.itential.core.plugins.module_utils import profiler
+from ansible_collections.itential.core.plugins.module_utils import ratelimit
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
     from requests.auth import HTTPBasicAuth
 except ImportError:
     raise AnsibleError("missing required library: requests")
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data) -> typing.Any:
+    """Deserializes a JSON document
+
+    The `orjson` library is used when it is installed, otherwise the
+    standard library `json` module is used.
+
+    Args:
+        data (bytes): The JSON document as bytes, a memoryview or a string
+
+    Returns:
+        The deserialized document
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+@dataclass
+class PoolOptions(object):
+    """PoolOptions configures the process wide connection pools
+
+    Args:
+        connections (int): The number of per-host connection pools to
+            keep in each pool registry entry
+
+        maxsize (int): The maximum number of connections to keep open
+            per host
+
+        block (bool): When True, requests wait for a free connection
+            instead of opening connections beyond `maxsize`
+
+        idle_timeout (float): The number of seconds a pool may go unused
+            before its connections are closed.  A value of None keeps
+            idle connections open indefinitely
+    """
+    connections: int = 10
+    maxsize: int = 10
+    block: bool = False
+    idle_timeout: float = 60.0
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class RetryPolicy(object):
+    """RetryPolicy configures how requests are retried
+
+    A request is retried when the connection fails or the response has
+    one of the retryable status codes.  The delay between attempts
+    grows exponentially and is randomized to avoid many clients
+    retrying at the same time.  A `Retry-After` header in the response
+    is honored when it asks for a longer delay.  If it asks for a delay
+    longer than `max_backoff`, the request is not retried and the
+    response is returned to the caller.
+
+    Connection errors and read timeouts are only retried for `methods`.
+
+    Args:
+        attempts (int): The maximum number of attempts including the
+            first one
+
+        backoff (float): The delay in seconds before the first retry.
+            The delay doubles for each subsequent retry
+
+        max_backoff (float): The maximum delay in seconds between attempts
+
+        jitter (float): The fraction of the delay that is randomized.  A
+            value of 0 disables jitter and a value of 1 picks a random
+            delay between zero and the computed delay
+
+        statuses (frozenset): The response status codes to retry
+
+        methods (frozenset): The HTTP methods that are safe to retry.  By
+            default only idempotent methods are retried
+
+        retry_after (bool): Honor the `Retry-After` response header
+
+        deadline (float): The total number of seconds allowed across all
+            attempts.  A value of None does not limit the total time
+    """
+    attempts: int = 3
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+    jitter: float = 1.0
+    statuses: frozenset = frozenset((429, 502, 503, 504))
+    methods: frozenset = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"))
+    retry_after: bool = True
+    deadline: float = None
+
+    def delay(self, attempt, response=None) -> float:
+        """Returns the number of seconds to wait before the next attempt
+
+        Args:
+            attempt (int): The number of the attempt that just failed,
+                starting at 1
+            response (requests.Response): The response for the failed
+                attempt or None if the connection failed
+
+        Returns:
+            The delay in seconds or None if the request must not be
+            retried because the server asked to wait longer than
+            `max_backoff`
+        """
+        delay = min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+        delay -= delay * self.jitter * random.random()
+
+        if self.retry_after is True and response is not None:
+            after = retryafter(response.headers.get("Retry-After"))
+            if after is not None:
+                if after > self.max_backoff:
+                    return None
+                delay = max(delay, after)
+
+        return delay
+
+
+def retryafter(value) -> float:
+    """Parses the value of a `Retry-After` header
+
+    Args:
+        value (str): The header value as either a number of seconds or
+            an HTTP date
+
+    Returns:
+        The number of seconds to wait or None if the value is not valid
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+
+    return max(0.0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+@dataclass
+class Timeouts(object):
+    """Timeouts configures how long to wait for a request
+
+    Args:
+        connect (float): The number of seconds to wait for the connection
+            to the host to be established.  A value of None waits
+            indefinitely
+
+        read (float): The number of seconds to wait for the server to
+            send data on an established connection.  A value of None
+            waits indefinitely
+
+        deadline (float): The total number of seconds allowed for the
+            request including all retries and hedged requests.  The
+            connect and read timeouts of each attempt are capped by the
+            time left.  A value of None does not limit the total time
+    """
+    connect: float = None
+    read: float = None
+    deadline: float = None
+
+    def timeout(self) -> typing.Any:
+        """Returns the timeout in the form accepted by `send_request`
+
+        Returns:
+            A tuple of (connect, read) timeouts or None if neither is set
+        """
+        if self.connect is None and self.read is None:
+            return None
+        return (self.connect, self.read)
+
+
+@dataclass
+class HedgePolicy(object):
+    """HedgePolicy configures hedged requests
+
+    When a request has not completed after a delay, a duplicate request
+    is sent to the same host or to an alternate host and the first
+    response received is used.  The delay is taken from the latency of
+    recent requests to the host so that only the slowest requests are
+    hedged.
+
+    Args:
+        quantile (float): The quantile of recent latencies used as the
+            delay before a hedged request is sent
+
+        initial (float): The delay in seconds used until enough requests
+            have been sent to the host to compute the quantile
+
+        minimum (float): The minimum delay in seconds
+
+        samples (int): The number of recent requests required before
+            the quantile is used
+
+        hedges (int): The maximum number of hedged requests sent for
+            each request
+
+        hosts (tuple): The alternate hosts to send hedged requests to.
+            Hedged requests are sent to each host in turn.  If empty,
+            hedged requests are sent to the same host
+
+        methods (frozenset): The HTTP methods that are safe to hedge.
+            Only idempotent methods are hedged by default
+    """
+    quantile: float = 0.95
+    initial: float = 1.0
+    minimum: float = 0.01
+    samples: int = 20
+    hedges: int = 1
+    hosts: tuple = ()
+    methods: frozenset = frozenset(("GET", "HEAD", "OPTIONS"))
+
+    def delay(self, latency) -> float:
+        """Returns the number of seconds to wait before hedging
+
+        Args:
+            latency (Latency): The recent latencies for the host
+
+        Returns:
+            The delay in seconds
+        """
+        if latency is None or latency.count() < self.samples:
+            return max(self.minimum, self.initial)
+        return max(self.minimum, latency.quantile(self.quantile))
+
+
+class Latency(object):
+    """Latency records the duration of recent requests to a host
+
+    Args:
+        size (int): The number of recent requests to keep
+    """
+    def __init__(self, size=100):
+        self.samples = collections.deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def add(self, value) -> None:
+        """Records the duration of a request
+
+        Args:
+            value (float): The duration in seconds
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.samples.append(value)
+
+    def count(self) -> int:
+        """Returns the number of recorded requests
+
+        Returns:
+            The number of samples
+        """
+        return len(self.samples)
+
+    def quantile(self, q) -> float:
+        """Returns the quantile of the recorded durations
+
+        Args:
+            q (float): The quantile between 0 and 1
+
+        Returns:
+            The duration in seconds or None if there are no samples
+        """
+        with self.lock:
+            values = sorted(self.samples)
+
+        if not values:
+            return None
+
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def capped(timeout, remaining) -> typing.Any:
+    """Limits a timeout to the time remaining before a deadline
+
+    Args:
+        timeout (any): A number of seconds, a tuple of (connect, read)
+            timeouts or None
+        remaining (float): The number of seconds left
+
+    Returns:
+        The timeout with each value no greater than remaining
+    """
+    if timeout is None:
+        return remaining
+    if isinstance(timeout, tuple):
+        return tuple(remaining if item is None else min(item, remaining) for item in timeout)
+    return min(timeout, remaining)
+
+
+class TLSSocket(ssl.SSLSocket):
+    """TLSSocket saves the TLS session when the connection is closed
+
+    With TLS 1.3 the session ticket is sent by the server after the
+    handshake so the session is saved again when the socket is closed
+    to capture the ticket for the next connection.
+    """
+    def close(self) -> None:
+        if not self.server_side:
+            self.context.remember(self)
+        super().close()
+
+
+class TLSContext(ssl.SSLContext):
+    """TLSContext resumes TLS sessions for client connections
+
+    The TLSContext object remembers the most recent TLS session for each
+    server and offers it when a new connection is made to the same
+    server so the server can resume the session and skip the full
+    handshake.
+    """
+    sslsocket_class = TLSSocket
+
+    def __init__(self, *args, **kwargs):
+        self.sessions = dict()
+
+    def remember(self, sock) -> None:
+        """Saves the TLS session of a client socket
+
+        Args:
+            sock (ssl.SSLSocket): The connected socket
+
+        Returns:
+            None
+        """
+        try:
+            session = sock.session
+            key = (sock.server_hostname, sock.getpeername()[1])
+        except (OSError, ValueError):
+            return
+
+        if session is not None:
+            self.sessions[key] = session
+
+    def wrap_socket(self, sock, server_side=False, do_handshake_on_connect=True,
+                    suppress_ragged_eofs=True, server_hostname=None, session=None) -> ssl.SSLSocket:
+        if not server_side and session is None:
+            try:
+                session = self.sessions.get((server_hostname, sock.getpeername()[1]))
+            except OSError:
+                session = None
+
+        start = time.monotonic()
+
+        sslsock = super().wrap_socket(
+            sock,
+            server_side=server_side,
+            do_handshake_on_connect=do_handshake_on_connect,
+            suppress_ragged_eofs=suppress_ragged_eofs,
+            server_hostname=server_hostname,
+            session=session,
+        )
+
+        if not server_side and do_handshake_on_connect:
+            metrics.handshake(time.monotonic() - start)
+            if sslsock.session_reused:
+                display.vvvvv(f"resumed TLS session with {server_hostname}")
+            self.remember(sslsock)
+
+        return sslsock
+
+
+_contexts = {}
+_contexts_lock = threading.Lock()
+
+
+def sslcontext(verify=True, cert=None) -> ssl.SSLContext:
+    """Returns the shared TLS context for verify and cert
+
+    One context is created per CA bundle, client certificate, private
+    key and certificate validation setting and shared by every session
+    and connection pool in the process.  The CA bundle and key files
+    are only loaded when the context is created.
+
+    Args:
+        verify (any): Enable or disable certificate validation or the
+            path to a CA bundle file or directory.  When True or None,
+            the CA bundle used by `requests` is loaded
+        cert (any): The client certificate file or a tuple of the client
+            certificate and private key files
+
+    Returns:
+        A `TLSContext` object
+    """
+    if verify is None:
+        verify = True
+
+    key = (verify, cert)
+
+    with _contexts_lock:
+        ctx = _contexts.get(key)
+
+        if ctx is None:
+            ctx = TLSContext(ssl.PROTOCOL_TLS_CLIENT)
+            ctx.minimum_version = ssl.TLSVersion.TLSv1_2
+
+            if verify is False:
+                ctx.check_hostname = False
+                ctx.verify_mode = ssl.CERT_NONE
+            elif verify is True:
+                ctx.load_verify_locations(requests.utils.extract_zipped_paths(requests.utils.DEFAULT_CA_BUNDLE_PATH))
+            elif os.path.isdir(verify):
+                ctx.load_verify_locations(capath=verify)
+            else:
+                ctx.load_verify_locations(cafile=verify)
+
+            if isinstance(cert, tuple):
+                ctx.load_cert_chain(cert[0], cert[1])
+            elif cert is not None:
+                ctx.load_cert_chain(cert)
+
+            _contexts[key] = ctx
+
+    return ctx
+
+
+class TimedConnection(object):
+    """TimedConnection records the time spent opening connections
+
+    The time to resolve the host name and establish the TCP connection
+    is recorded in `metrics` for each new connection.
+    """
+    def _new_conn(self) -> typing.Any:
+        start = time.monotonic()
+        sock = super()._new_conn()
+        metrics.connected(time.monotonic() - start)
+        return sock
+
+
+class TimedHTTPConnection(TimedConnection, urllib3.connection.HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnection, urllib3.connection.HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TLSAdapter(HTTPAdapter):
+    """TLSAdapter is a transport adapter that uses shared TLS contexts
+
+    The `requests` library loads the CA bundle and the client
+    certificate every time a connection is made.  The TLSAdapter object
+    instead connects using the context returned by `sslcontext` which
+    has the files loaded once and resumes TLS sessions.  The connection
+    pools record the time spent opening connections, see `metrics`.
+
+    The context for `verify` and `cert` is set on the pool manager so
+    it is used by every version of `requests`.  Versions that select
+    the pool for each request also use the context for the request
+    settings, see `build_connection_pool_key_attributes`.
+
+    Args:
+        verify (any): The certificate validation setting or the path to
+            a CA bundle the adapter is used with
+
+        cert (any): The client certificate file or a tuple of the client
+            certificate and private key files the adapter is used with
+    """
+    __attrs__ = HTTPAdapter.__attrs__ + ["verify", "cert"]
+
+    def __init__(self, verify=None, cert=None, **kwargs):
+        self.verify = verify
+        self.cert = cert
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        kwargs.setdefault("ssl_context", sslcontext(self.verify, self.cert))
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs) -> urllib3.PoolManager:
+        proxy_kwargs.setdefault("ssl_context", sslcontext(self.verify, self.cert))
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None) -> tuple:
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+
+        if host_params.get("scheme") == "https":
+            for name in ("ca_certs", "ca_cert_dir", "cert_file", "key_file"):
+                pool_kwargs.pop(name, None)
+            pool_kwargs["ssl_context"] = sslcontext(verify, cert)
+
+        return host_params, pool_kwargs
+
+    def cert_verify(self, conn, url, verify, cert) -> None:
+        if not url.lower().startswith("https"):
+            return super().cert_verify(conn, url, verify, cert)
+
+        # the CA bundle and client certificate are loaded in the context
+        conn.cert_reqs = "CERT_NONE" if verify is False else "CERT_REQUIRED"
+        conn.ca_certs = None
+        conn.ca_cert_dir = None
+
+
+_pool_options = PoolOptions()
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def set_pool_options(connections=None, maxsize=None, block=None, idle_timeout=None) -> None:
+    """Overrides the connection pool options
+
+    The new options apply to pools created after this function is
+    called.  Any argument that is None is left unchanged.
+
+    Args:
+        connections (int): The number of per-host connection pools
+        maxsize (int): The maximum number of connections per host
+        block (bool): Wait for a free connection when the pool is full
+        idle_timeout (float): Seconds before idle connections are closed
+
+    Returns:
+        None
+    """
+    if connections is not None:
+        _pool_options.connections = connections
+    if maxsize is not None:
+        _pool_options.maxsize = maxsize
+    if block is not None:
+        _pool_options.block = block
+    if idle_timeout is not None:
+        _pool_options.idle_timeout = idle_timeout
+
+
+def pool(url, verify=None, cert=None) -> HTTPAdapter:
+    """Returns the shared transport adapter for a URL
+
+    The registry holds one `requests` transport adapter, and therefore
+    one pool of warm connections, per scheme, host, port, certificate
+    validation setting and client certificate.  Adapters are shared by
+    every session in the process.  Connections that have been idle
+    longer than the configured idle timeout are closed before the
+    adapter is returned.  The registry is reset in a forked child so
+    sockets are never shared across processes.
+
+    Args:
+        url (str): The URL the adapter will be used for
+        verify (bool): The certificate validation setting
+        cert (tuple): The client certificate and private key files
+
+    Returns:
+        A `requests.adapters.HTTPAdapter` object
+    """
+    global _pools_pid
+
+    parts = urllib.parse.urlsplit(url)
+    scheme = parts.scheme.lower()
+    port = parts.port or (443 if scheme == "https" else 80)
+
+    key = (scheme, parts.hostname, port, verify, cert)
+    now = time.monotonic()
+
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+
+        entry = _pools.get(key)
+
+        if entry is None:
+            adapter = TLSAdapter(
+                verify=verify,
+                cert=cert,
+                pool_connections=_pool_options.connections,
+                pool_maxsize=_pool_options.maxsize,
+                pool_block=_pool_options.block,
+            )
+            entry = [adapter, now]
+            _pools[key] = entry
+
+        elif _pool_options.idle_timeout is not None and now - entry[1] > _pool_options.idle_timeout:
+            display.vvvvv(f"closing idle connections for {scheme}://{parts.netloc}")
+            entry[0].close()
+
+        entry[1] = now
+
+    return entry[0]
+
+
+def stock(prefix, adapter) -> bool:
+    """Checks if adapter is the default adapter mounted by `requests`
+
+    Args:
+        prefix (str): The prefix the adapter is mounted for
+        adapter (requests.adapters.BaseAdapter): The mounted adapter
+
+    Returns:
+        True if the adapter is the unmodified adapter mounted on every
+        new `requests.Session` for the scheme
+    """
+    return (
+        prefix in ("http://", "https://")
+        and type(adapter) is HTTPAdapter
+        and adapter.max_retries.total == 0
+        and adapter.max_retries.read is False
+        and adapter._pool_connections == requests.adapters.DEFAULT_POOLSIZE
+        and adapter._pool_maxsize == requests.adapters.DEFAULT_POOLSIZE
+        and adapter._pool_block == requests.adapters.DEFAULT_POOLBLOCK
+    )
+
+
+def mount(session, url, verify=None, cert=None) -> None:
+    """Mounts the shared transport adapter for url on a session
+
+    The shared adapter only replaces the default adapter `requests`
+    mounts or a shared adapter mounted by an earlier call.  An adapter
+    mounted on the session by the caller is left in place.
+
+    Args:
+        session (requests.Session): The session to mount the adapter on
+        url (str): The URL the adapter will be used for
+        verify (bool): The certificate validation setting
+        cert (tuple): The client certificate and private key files
+
+    Returns:
+        None
+    """
+    parts = urllib.parse.urlsplit(url)
+    prefix = f"{parts.scheme.lower()}://{parts.netloc.lower()}"
+
+    for key, current in session.adapters.items():
+        if url.lower().startswith(key.lower()):
+            if not isinstance(current, TLSAdapter) and not stock(key, current):
+                display.vvvvv(f"using the adapter mounted on the session for {key}")
+                return
+            break
+
+    adapter = pool(url, verify, cert)
+
+    if session.adapters.get(prefix) is not adapter:
+        session.mount(prefix, adapter)
+
+
+def release(session) -> None:
+    """Closes a session created for a single request
+
+    The shared adapters are removed from the session first so that
+    closing the session does not close the shared connection pools.
+
+    Args:
+        session (requests.Session): The session to close
+
+    Returns:
+        None
+    """
+    for key, adapter in list(session.adapters.items()):
+        if isinstance(adapter, TLSAdapter):
+            del session.adapters[key]
+
+    session.close()
+
+
+@display.traced("http.send_request")
+@profiler.timed("http.send_request")
+def send_request(method, url, headers=None, data=None, params=None, auth=None, timeout=None,
+                certificate_file=None, private_key_file=None, verify=None, disable_warnings=None,
+                session=None, stream=False, compress=False, retry=None, rate_limit=None,
+                deadline=None) -> requests.Response:
+    """ Send the request to the host and return the response
+
+    This function sends the request to the host and waits for the
+    response.  The raw response object is returned to the calling
+    function.
+
+    Args:
+        method (str): The HTTP method for the request
+        url (str): The full HTTP URL to send the request to
+        headers (dict): A dictionary that contains any headers to include
+            in the request
+        data (bytes): The body of the HTTP API request.  The body may be
+            bytes, a memoryview, a `os.PathLike` path to a file, a binary
+            file object or an iterable that yields bytes.  Files are sent
+            with a known `Content-Length` while iterables are sent using
+            chunked transfer encoding
+        params (dict): A dictionary that cotains one or more values used
+            to construct a query string to include with the request
+        auth (typing.Any): A `requests` auth object
+        timeout (int): Configures the timeout for waiting for a response
+            from the remote API.  The value is either a number of seconds
+            or a tuple of (connect, read) timeouts
+        verify (bool): Enable or disable certificate validation
+        disable_warnings (bool): Enable or disable `urllib3` warnings
+        session (requests.Session): A `requests.Session` object.  If
+            no session is provided, a new session is created for the
+            request and closed once the response is received.  The
+            connection is taken from the process wide connection pool
+            unless the caller mounted its own adapter for the URL
+        stream (bool): When True, only the response headers are read
+            before returning.  The body must be consumed by the caller
+            using `iter_content` and the response closed
+        compress (bool): When True, the body is gzip compressed as it
+            is sent and the `Content-Encoding` header is set
+        retry (RetryPolicy): The policy used to retry the request on a
+            connection error or a retryable status code.  Requests with
+            a body that cannot be sent again, such as an iterator, are
+            never retried
+        rate_limit (float): The maximum number of requests per second
+            to send to the host.  The limit is shared by all processes
+            on the local system so it applies across Ansible forks
+        deadline (float): The total number of seconds allowed for the
+            request including all retries.  The timeout of each attempt
+            is capped by the time left
+
+    Returns
+        A `Response` object that contains the response from the API call
+    """
+    display.trace("http.send_request")
+    display.current().set(method=method, url=url)
+
+    if disable_warnings is True:
+        urllib3.disable_warnings()
+
+    kwargs = {
+        "method": method,
+        "url": url,
+        "headers": headers,
+        "params": params,
+        "verify": verify,
+    }
+
+    if auth is not None:
+        kwargs["auth"] = auth
+
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+
+    if certificate_file is not None and private_key_file is not None:
+        kwargs["cert"] = (certificate_file, private_key_file)
+
+    if data is not None:
+        if isinstance(data, (str, dict)) or not (
+            isinstance(data, (bytes, bytearray, memoryview, os.PathLike))
+            or hasattr(data, "read")
+            or hasattr(data, "__iter__")
+        ):
+            raise AnsibleError(
+                f"invalid type for data, expected bytes, memoryview, path, file or iterable, got {type(data)}"
+            )
+
+        if isinstance(data, memoryview):
+            data = data.cast("B")
+
+        elif not isinstance(data, (bytes, bytearray, os.PathLike)) and not hasattr(data, "read"):
+            data = iter(data)
+
+    if compress is True:
+        kwargs["headers"] = dict(headers or {}, **{"Content-Encoding": "gzip"})
+
+    if stream is True:
+        kwargs["stream"] = True
+
+    created = session is None
+    if created:
+        session = requests.Session()
+
+    mount(session, url, verify, kwargs.get("cert"))
+
+    # a body can only be sent again if it can be reopened or rewound
+    position = None
+    replayable = data is None or isinstance(data, (bytes, bytearray, memoryview, os.PathLike))
+
+    if hasattr(data, "read") and hasattr(data, "seekable") and data.seekable():
+        position = data.tell()
+        replayable = True
+
+    attempts = 1
+    if retry is not None and replayable and method.upper() in retry.methods:
+        attempts = max(1, retry.attempts)
+
+    expires = None
+    for item in (deadline, retry.deadline if retry is not None else None):
+        if item is not None:
+            expires = min(expires, time.monotonic() + item) if expires is not None else time.monotonic() + item
+
+    limiter = None
+    if rate_limit is not None:
+        parts = urllib.parse.urlsplit(url)
+        limiter = ratelimit.bucket(f"{parts.scheme}://{parts.hostname}:{parts.port or ''}", rate_limit)
+
+    attempt = 0
+    start = time.monotonic()
+    metrics.begin()
+
+    try:
+        while True:
+            attempt += 1
+            opened = None
+            error = None
+            resp = None
+
+            body = data
+
+            if isinstance(data, os.PathLike):
+                body = opened = open(data, "rb")
+            elif position is not None and attempt > 1:
+                data.seek(position)
+
+            if body is not None:
+                kwargs["data"] = gzip_chunks(body) if compress is True else body
+
+            if limiter is not None:
+                limiter.acquire()
+
+            if expires is not None:
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    if opened is not None:
+                        opened.close()
+                    raise AnsibleError(f"Deadline exceeded sending request to {url}")
+                kwargs["timeout"] = capped(timeout, remaining)
+
+            display.vvvvv(lambda: f"Request object: {kwargs}")
+
+            try:
+                resp = session.request(**kwargs)
+
+                display.vvv(f"HTTP response is {resp.status_code} {resp.reason}")
+                if stream is not True:
+                    display.vvvvv(lambda: f"Start of response body\n{resp.text}\nEnd of response body")
+                display.vvvvv(f"Call completed in {resp.elapsed}")
+
+            except requests.exceptions.ConnectionError as exc:
+                display.vvvvv(traceback.format_exc)
+                error = AnsibleError(f"Failed to establish a connection to {url}")
+
+            except requests.exceptions.ReadTimeout as exc:
+                # only retried when the method is in the retry policy,
+                # see attempts
+                display.vvvvv(traceback.format_exc)
+                error = AnsibleError(f"Timed out waiting for a response from {url}")
+
+            except requests.exceptions.Timeout as exc:
+                display.vvvvv(traceback.format_exc)
+                raise AnsibleError(f"Timed out waiting for a response from {url}")
+
+            except Exception as exc:
+                display.vvvvv(traceback.format_exc)
+                raise AnsibleError(str(exc))
+
+            finally:
+                if opened is not None:
+                    opened.close()
+
+            if resp is not None and (retry is None or resp.status_code not in retry.statuses):
+                break
+
+            delay = None
+            if attempt < attempts:
+                delay = retry.delay(attempt, resp)
+                if delay is not None and expires is not None and time.monotonic() + delay >= expires:
+                    delay = None
+
+            if delay is None:
+                break
+
+            reason = f"{resp.status_code} {resp.reason}" if resp is not None else str(error)
+            display.trace(lambda: f"http.send_request retry {attempt} of {attempts - 1} for {url} in {delay:.2f}s ({reason})")
+
+            if resp is not None:
+                resp.close()
+
+            time.sleep(delay)
+
+    except AnsibleError:
+        measure(url, None, start, attempt, data, stream)
+        if created:
+            release(session)
+        raise
+
+    if created:
+        release(session)
+
+    if attempt > 1:
+        display.trace(lambda: f"http.send_request finished after {attempt} attempts ({attempt - 1} retries)")
+
+    measure(url, resp, start, attempt, data, stream)
+
+    display.current().set(
+        status=resp.status_code if resp is not None else None,
+        attempts=attempt,
+    )
+
+    if resp is None:
+        raise error
+
+    return resp
+
+
+def measure(url, resp, start, attempts, data=None, stream=False) -> None:
+    """Records the metrics for a request sent by `send_request`
+
+    Args:
+        url (str): The full HTTP URL the request was sent to
+        resp (requests.Response): The response or None if the request failed
+        start (float): The monotonic time the request was started
+        attempts (int): The number of attempts made
+        data (any): The request body
+        stream (bool): True if the response body has not been read
+
+    Returns:
+        None
+    """
+    if metrics.registry.enabled is not True:
+        return
+
+    total = time.monotonic() - start
+    parts = urllib.parse.urlsplit(url)
+
+    sent = 0
+    if isinstance(data, (bytes, bytearray)):
+        sent = len(data)
+    elif isinstance(data, memoryview):
+        sent = data.nbytes
+    elif resp is not None:
+        sent = int(resp.request.headers.get("Content-Length") or 0)
+
+    if resp is None:
+        metrics.record(parts.netloc, parts.path, None, None, total, sent, 0, max(0, attempts - 1))
+        return
+
+    if stream is True:
+        received = int(resp.headers.get("Content-Length") or 0)
+    else:
+        received = len(resp.content)
+
+    metrics.record(
+        parts.netloc,
+        parts.path,
+        resp.status_code,
+        resp.elapsed.total_seconds(),
+        total,
+        sent,
+        received,
+        attempts - 1,
+    )
+
+
+def gzip_chunks(data, chunk_size=CHUNK_SIZE) -> typing.Iterator[bytes]:
+    """Compresses a request body with gzip as it is sent
+
+    Args:
+        data (any): The body as bytes, a memoryview, a binary file
+            object or an iterator that yields bytes
+        chunk_size (int): The number of bytes to read at a time from
+            bytes or file objects
+
+    Returns:
+        An iterator of gzip compressed chunks
+    """
+    compressor = zlib.compressobj(wbits=31)
+
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        view = memoryview(data)
+        chunks = (view[i:i + chunk_size] for i in range(0, len(view), chunk_size))
+    elif hasattr(data, "read"):
+        chunks = iter(functools.partial(data.read, chunk_size), b"")
+    else:
+        chunks = data
+
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
+
+
+get = functools.partial(send_request, "GET")
+post = functools.partial(send_request, "POST")
+put = functools.partial(send_request, "PUT")
+delete = functools.partial(send_request, "DELETE")
+patch = functools.partial(send_request, "PATCH")
+
+
+def make_url(host, path, port=0, use_tls=True) -> str:
+    """ Join parts of the request to construct a valid URL
+
+    This function will take the request object and join the
+    individual parts together to cnstruct a full URL.
+
+    Args:
+        host (str): The hostname or IP address of the API endpoint
+        port (int): The port used to connect to the API
+        path (str): The URI path of the endpoint
+        use_tls (bool): Enable or disable TLS support
+
+    Returns:
+        A string that represents the full URL
+    """
+    display.trace("http.make_url")
+
+    if port == 0:
+        port = 443 if use_tls is True else 80
+
+    if port not in (None, 80, 443):
+        host = f"{host}:{port}"
+
+    if path[0] == "/":
+        path = path[1:]
+
+    proto = "https" if use_tls else "http"
+
+    return urllib.parse.urlunsplit((proto, host, path, None, None))
+
+
+def basic_auth(username, password) -> HTTPBasicAuth:
+    """Constructs a basic authentication object
+
+    This function accepts a `username` and `password` argument
+    and will construct a basic authentication object that can
+    be used to in a request.
+
+    Args:
+        username (str): The username to use when authenticating
+        password (str): The password to use when authenticating
+
+    Returns:
+        A `requests.HTTPBasicAuth` object
+    """
+    display.trace("http.basic_auth")
+    return HTTPBasicAuth(username, password)
+
+
+@dataclass
+class Response(object):
+    """ Response respresents a response from an HTTP request
+
+    The Response object provides access to the response from
+    a HTTP request that includes the body of the response, response
+    status and header information.
+
+    Args:
+        headers (dict): Set of key/value pairs returned from the API call
+
+        body (bytes): The body of the response
+
+        status_code (int): The HTTP status code in the response
+
+        status (str):  The HTTP status text in the response
+    """
+    headers: dict
+    body: bytes
+    status_code: int
+    status: str
+
+    @functools.cached_property
+    def text(self) -> str:
+        """The body of the response decoded to a string
+
+        The body is decoded using the character set from the
+        `Content-Type` header, defaulting to utf-8.  The body is only
+        decoded the first time this property is accessed.
+
+        Returns:
+            The body as a string or None if there is no body
+        """
+        if self.body is None:
+            return None
+        return str(self.body, _charset(self.headers or {}), "replace")
+
+    def json(self) -> typing.Any:
+        """Deserializes the JSON body of the response
+
+        The body is only deserialized the first time this method is
+        called.  Subsequent calls return the same object.
+
+        Returns:
+            The deserialized body
+        """
+        if "_json" not in self.__dict__:
+            self.__dict__["_json"] = loads(self.body)
+        return self.__dict__["_json"]
+
+
+@dataclass
+class Request(object):
+    """Request represents an HTTP request
+
+    The Request object represents an HTTP request to be sent
+    to an API endpoint.  The Request object is used to create
+    and send an API call.
+
+    Args:
+        host (str): The hostname or IP address of the API endpoint
+
+        port (int): The port used to connect to the API endpoint.  If
+            the value of the port is 0, it will automatically be
+            determined based on the `use_tls`
+
+        method (str): The HTTP method to invoke.  Valid values include
+            `GET`, `POST`, `PUT`, `PATCH`, `DELETE`.
+
+        path (str): The URI to send the request to.  The URI will be
+            combined with the `host` and `port` to construct the full
+            URL to send the request to.
+
+        body (bytes): The body of the HTTP request.  See `send_request`
+            for the supported body types
+
+        headers (dict): The HTTP headers to set in the API request
+
+        use_tls (bool): Enable or disable the use of TLS when sending
+            the request to the API
+
+        disable_warnings (bool): Enable or disable Python warnings
+            generated by urllib3
+
+        verify (bool): Enable or disable certificate validation when
+            connecting to the API host.
+
+        compress (bool): Enable or disable gzip compression of the
+            request body
+
+        retry (RetryPolicy): The policy used to retry the request.  If
+            None, the session retry policy is used
+
+        rate_limit (float): The maximum number of requests per second to
+            send to the host.  If None, the session rate limit is used
+
+        coalesce (bool): Share the response with identical requests that
+            are in flight at the same time.  If None, `GET` and `HEAD`
+            requests are coalesced when the session enables it.  Set to
+            True to coalesce other requests, such as logins, that are
+            safe to share
+
+        timeouts (Timeouts): The connect and read timeouts and the total
+            deadline for the request.  If None, the session timeouts are
+            used
+
+        hedge (HedgePolicy): The policy used to hedge the request.  If
+            None, the session hedge policy is used
+
+    """
+    host: str
+    port: int = 0
+    method: str = "GET"
+    path: str = None
+    body: bytes = None
+    headers: dict = field(default_factory=dict)
+    use_tls: bool = True
+    disable_warnings: bool = True
+    verify: bool = True
+    compress: bool = False
+    retry: RetryPolicy = None
+    rate_limit: float = None
+    coalesce: bool = None
+    timeouts: Timeouts = None
+    hedge: HedgePolicy = None
+
+
+def setquery(path, params) -> str:
+    """Sets query string parameters on a request path
+
+    Args:
+        path (str): The request path which may include a query string
+        params (dict): The parameters to add or replace
+
+    Returns:
+        The path with the updated query string.  Parameters that are
+        repeated in the path and not in params are kept
+    """
+    parts = urllib.parse.urlsplit(path)
+
+    query = dict()
+    for key, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True):
+        query.setdefault(key, []).append(value)
+
+    query.update((k, [str(v)]) for k, v in params.items())
+
+    return urllib.parse.urlunsplit(("", "", parts.path, urllib.parse.urlencode(query, doseq=True), ""))
+
+
+def origin(parts) -> tuple:
+    """Returns the origin of a URL
+
+    Args:
+        parts (urllib.parse.SplitResult): The parsed URL
+
+    Returns:
+        A tuple of (scheme, host, port) with the default port of the
+        scheme when the URL does not include one
+    """
+    scheme = parts.scheme.lower()
+    return (scheme, (parts.hostname or "").lower(), parts.port or (443 if scheme == "https" else 80))
+
+
+def getquery(path, name) -> str:
+    """Returns the value of a query string parameter from a request path
+
+    Args:
+        path (str): The request path which may include a query string
+        name (str): The name of the parameter
+
+    Returns:
+        The value of the parameter or None if it is not set
+    """
+    query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(path or "").query))
+    return query.get(name)
+
+
+def lookup(data, key) -> typing.Any:
+    """Returns the value at a dotted key in a deserialized JSON document
+
+    Args:
+        data (any): The deserialized document
+        key (str): The dotted key, for instance `metadata.total`.  If
+            the key is None, the document itself is returned
+
+    Returns:
+        The value or None if the key does not exist
+    """
+    if key is None:
+        return data
+    for item in key.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(item)
+    return data
+
+
+@dataclass
+class OffsetPagination(object):
+    """OffsetPagination pages through an API using offset and limit parameters
+
+    Args:
+        records (str): The dotted key of the list of records in the
+            response body.  If None, the body is the list of records
+
+        total (str): The dotted key of the total number of records in
+            the response body.  When the total is known, the remaining
+            pages can be prefetched
+
+        limit (int): The number of records to request per page
+
+        offset_param (str): The name of the offset query parameter
+
+        limit_param (str): The name of the limit query parameter
+
+        start (int): The offset of the first record to request
+    """
+    records: str = None
+    total: str = None
+    limit: int = 100
+    offset_param: str = "offset"
+    limit_param: str = "limit"
+    start: int = 0
+
+    def page(self, request, offset) -> Request:
+        """Returns the request for the page at offset
+
+        Args:
+            request (Request): The request for any page
+            offset (int): The offset of the first record in the page
+
+        Returns:
+            A `Request` object
+        """
+        return dataclasses.replace(
+            request,
+            path=setquery(request.path, {self.offset_param: offset, self.limit_param: self.limit}),
+        )
+
+    def first(self, request) -> Request:
+        """Returns the request for the first page
+
+        Args:
+            request (Request): The request provided by the caller
+
+        Returns:
+            A `Request` object
+        """
+        return self.page(request, self.start)
+
+    def next(self, request, response, records) -> Request:
+        """Returns the request for the next page
+
+        Args:
+            request (Request): The request for the current page
+            response (Response): The response for the current page
+            records (list): The records in the current page
+
+        Returns:
+            A `Request` object or None if this is the last page
+        """
+        if len(records) < self.limit:
+            return None
+
+        offset = int(getquery(request.path, self.offset_param) or 0) + self.limit
+
+        total = lookup(response.json(), self.total) if self.total is not None else None
+        if total is not None and offset >= total:
+            return None
+
+        return self.page(request, offset)
+
+    def remaining(self, request, response, records) -> typing.Iterator[Request]:
+        """Returns the requests for all remaining pages
+
+        Args:
+            request (Request): The request for the current page
+            response (Response): The response for the current page
+            records (list): The records in the current page
+
+        Returns:
+            An iterator of `Request` objects or None if the total number
+            of records is not known
+        """
+        if self.total is None or len(records) < self.limit:
+            return None
+
+        total = lookup(response.json(), self.total)
+        if not isinstance(total, int):
+            return None
+
+        offset = int(getquery(request.path, self.offset_param) or 0) + self.limit
+
+        return (self.page(request, item) for item in range(offset, total, self.limit))
+
+
+@dataclass
+class CursorPagination(object):
+    """CursorPagination pages through an API using a cursor returned in the body
+
+    Args:
+        records (str): The dotted key of the list of records in the
+            response body.  If None, the body is the list of records
+
+        cursor (str): The dotted key of the cursor for the next page in
+            the response body
+
+        cursor_param (str): The name of the query parameter used to send
+            the cursor
+    """
+    records: str = None
+    cursor: str = "next"
+    cursor_param: str = "cursor"
+
+    def first(self, request) -> Request:
+        """Returns the request for the first page
+
+        Args:
+            request (Request): The request provided by the caller
+
+        Returns:
+            A `Request` object
+        """
+        return request
+
+    def next(self, request, response, records) -> Request:
+        """Returns the request for the next page
+
+        Args:
+            request (Request): The request for the current page
+            response (Response): The response for the current page
+            records (list): The records in the current page
+
+        Returns:
+            A `Request` object or None if this is the last page
+        """
+        cursor = lookup(response.json(), self.cursor)
+        if not cursor:
+            return None
+        return dataclasses.replace(request, path=setquery(request.path, {self.cursor_param: cursor}))
+
+    def remaining(self, request, response, records) -> typing.Iterator[Request]:
+        """Returns None since cursors must be followed in order
+
+        Args:
+            request (Request): The request for the current page
+            response (Response): The response for the current page
+            records (list): The records in the current page
+
+        Returns:
+            None
+        """
+        return None
+
+
+@dataclass
+class LinkPagination(object):
+    """LinkPagination pages through an API using the `Link` response header
+
+    The URL of the next page is taken from the `rel="next"` entry in
+    the `Link` header as described in RFC 8288.  The next page is sent
+    with the session headers and credentials so only links to the same
+    scheme, host and port as the current page are followed.
+
+    Args:
+        records (str): The dotted key of the list of records in the
+            response body.  If None, the body is the list of records
+    """
+    records: str = None
+
+    def first(self, request) -> Request:
+        """Returns the request for the first page
+
+        Args:
+            request (Request): The request provided by the caller
+
+        Returns:
+            A `Request` object
+        """
+        return request
+
+    def next(self, request, response, records) -> Request:
+        """Returns the request for the next page
+
+        Args:
+            request (Request): The request for the current page
+            response (Response): The response for the current page
+            records (list): The records in the current page
+
+        Returns:
+            A `Request` object or None if this is the last page
+
+        Raises:
+            AnsibleError: If the next page is on a different origin
+        """
+        header = (response.headers or {}).get("Link")
+        if not header:
+            return None
+
+        for link in requests.utils.parse_header_links(header):
+            if link.get("rel") == "next" and link.get("url"):
+                current = make_url(request.host, request.path, request.port, request.use_tls)
+                parts = urllib.parse.urlsplit(urllib.parse.urljoin(current, link["url"]))
+
+                if origin(parts) != origin(urllib.parse.urlsplit(current)):
+                    raise AnsibleError(f"refusing to follow next page link to a different origin: {link['url']}")
+
+                path = parts.path if not parts.query else f"{parts.path}?{parts.query}"
+                return dataclasses.replace(
+                    request,
+                    host=parts.hostname,
+                    port=parts.port or 0,
+                    path=path or "/",
+                    use_tls=parts.scheme == "https",
+                )
+
+        return None
+
+    def remaining(self, request, response, records) -> typing.Iterator[Request]:
+        """Returns None since links must be followed in order
+
+        Args:
+            request (Request): The request for the current page
+            response (Response): The response for the current page
+            records (list): The records in the current page
+
+        Returns:
+            None
+        """
+        return None
+
+
+@dataclass
+class Result(object):
+    """Result represents the outcome of a request sent by `Session.send_many`
+
+    Args:
+        request (Request): The request that was sent
+
+        response (Response): The response to the request or None if the
+            request failed
+
+        error (Exception): The error raised while sending the request or
+            None if the request succeeded
+    """
+    request: Request
+    response: Response = None
+    error: Exception = None
+
+
+class SingleFlight(object):
+    """SingleFlight coalesces identical requests that are in flight
+
+    The SingleFlight object tracks the calls that are currently running
+    by key.  When a call is started for a key that is already running,
+    the caller waits for the running call to finish and receives the
+    same result, or the same exception, instead of starting a new call.
+    Once a call finishes the key is released so later calls are sent
+    again.
+
+    The same object can be used by threads with `call` and by tasks
+    running in an event loop with `acall`.
+
+    Args:
+        ignore (set): Lower case names of headers that are not used to
+            build the key, such as headers that are unique per request
+    """
+    IGNORE = frozenset(("user-agent", "x-request-id", "x-correlation-id", "traceparent", "tracestate"))
+
+    def __init__(self, ignore=None):
+        self.ignore = frozenset(ignore) if ignore is not None else self.IGNORE
+        self.lock = threading.Lock()
+        self.calls = dict()
+        self.tasks = dict()
+        self.stats = {"calls": 0, "shared": 0}
+
+    def key(self, method, url, headers=None, body=None) -> tuple:
+        """Returns the key that identifies a request
+
+        Args:
+            method (str): The HTTP method
+            url (str): The full URL for the request
+            headers (dict): The request headers
+            body (bytes): The request body
+
+        Returns:
+            The key as a tuple
+        """
+        items = tuple(sorted(
+            (k, str(v)) for k, v in ((str(k).lower(), v) for k, v in (headers or {}).items())
+            if k not in self.ignore
+        ))
+        digest = hashlib.sha256(body).hexdigest() if body else None
+        return (method.upper(), url, items, digest)
+
+    def call(self, key, func) -> typing.Any:
+        """Calls func unless a call for key is already in flight
+
+        Args:
+            key (tuple): The key that identifies the call
+            func (callable): The function to call
+
+        Returns:
+            The value returned by func
+        """
+        with self.lock:
+            flight = self.calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.calls[key] = [threading.Event(), None, None]
+            else:
+                self.stats["shared"] += 1
+
+        if not leader:
+            display.trace("http.SingleFlight.call shared")
+            flight[0].wait()
+        else:
+            try:
+                flight[1] = func()
+            except BaseException as exc:
+                flight[2] = exc
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                    self.stats["calls"] += 1
+                flight[0].set()
+
+        if flight[2] is not None:
+            raise flight[2]
+
+        return flight[1]
+
+    async def acall(self, key, func) -> typing.Any:
+        """Awaits func unless a call for key is already in flight
+
+        Args:
+            key (tuple): The key that identifies the call
+            func (callable): The coroutine function to call
+
+        Returns:
+            The value returned by func
+        """
+        task = self.tasks.get(key)
+
+        if task is not None:
+            self.stats["shared"] += 1
+            display.trace("http.SingleFlight.acall shared")
+        else:
+            task = asyncio.ensure_future(func())
+            self.tasks[key] = task
+
+            def release(_):
+                self.stats["calls"] += 1
+                if self.tasks.get(key) is task:
+                    del self.tasks[key]
+
+            task.add_done_callback(release)
+
+        # shield the shared task so a cancelled caller does not cancel
+        # the call for the other callers
+        return await asyncio.shield(task)
+
+
+def authidentity(auth) -> str:
+    """Returns a description of a `requests` auth value that is stable across processes
+
+    The default repr of an auth object includes its memory address
+    which differs in every worker.  Auth objects are described by their
+    type and the values of their attributes that are plain values.
+
+    Args:
+        auth (any): A tuple of (username, password) or a `requests` auth
+            object
+
+    Returns:
+        The description as a string
+    """
+    if isinstance(auth, (tuple, list)):
+        return repr(tuple(auth))
+
+    plain = (str, bytes, int, float, bool, type(None))
+
+    attributes = sorted(
+        (key, value) for key, value in vars(auth).items()
+        if isinstance(value, plain)
+        or (isinstance(value, (tuple, list)) and all(isinstance(item, plain) for item in value))
+    ) if hasattr(auth, "__dict__") else []
+
+    return f"{type(auth).__module__}.{type(auth).__qualname__}{attributes!r}"
+
+
+class ResponseCache(object):
+    """ResponseCache caches the responses to GET requests
+
+    Responses are held in an in-memory LRU bounded by the number of
+    entries and the total size of the cached bodies.  When `shared` is
+    True and the on-disk cache is enabled with `ITENTIAL_CACHE_DIR`,
+    responses are also stored on disk so they can be reused by other
+    Ansible workers.
+
+    A cached response is returned without contacting the server until
+    it expires.  The lifetime of a response is taken from the
+    `Cache-Control: max-age` response header or `ttl` if the header is
+    not set.  Once a response has expired, it is revalidated using the
+    `If-None-Match` and `If-Modified-Since` request headers and a `304
+    Not Modified` response returns the cached body.  Responses with
+    `Cache-Control: no-store` are never cached.
+
+    The cache key includes the URL, the request headers and a digest of
+    the credentials held by the session, its headers, cookies and
+    authentication, so responses are never returned to a session that
+    authenticated as a different user.
+
+    Responses stored on disk are removed once they are older than
+    `disk_max_age` and the oldest responses are removed when the total
+    size exceeds `disk_max_bytes`.  The directory is swept at most once
+    every `SWEEP_INTERVAL` seconds by each process.
+
+    Args:
+        ttl (float): The default number of seconds a response is fresh
+
+        max_entries (int): The maximum number of responses held in memory
+
+        max_bytes (int): The maximum total size of the response bodies
+            held in memory
+
+        shared (bool): Enable or disable storing responses on disk
+
+        disk_max_age (float): The number of seconds a response is kept
+            on disk
+
+        disk_max_bytes (int): The maximum total size of the responses
+            stored on disk
+
+        stats (dict): Counters for cache `hits`, `misses`,
+            `revalidated` responses, `stores` and `evictions`
+    """
+    SWEEP_INTERVAL = 60.0
+
+    def __init__(self, ttl=60.0, max_entries=256, max_bytes=64 * 1024 * 1024, shared=False,
+                 disk_max_age=24 * 60 * 60, disk_max_bytes=256 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.disk_max_age = disk_max_age
+        self.disk_max_bytes = disk_max_bytes
+        self.swept = None
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.stats = dict.fromkeys(("hits", "misses", "revalidated", "stores", "evictions"), 0)
+
+    def key(self, url, headers, session=None) -> str:
+        """Returns the cache key for a request
+
+        Args:
+            url (str): The full URL for the request
+            headers (dict): The request headers
+            session (Session): The session used to send the request.  If
+                set, a digest of its credentials is part of the key
+
+        Returns:
+            The cache key as a string
+        """
+        items = sorted((str(k).lower(), str(v)) for k, v in (headers or {}).items())
+        key = f"{url}\n{items}"
+
+        if session is not None:
+            key = f"{key}\n{self.identity(session)}"
+
+        return key
+
+    def identity(self, session) -> str:
+        """Returns a digest of the credentials held by a session
+
+        Args:
+            session (Session): The session used to send the request
+
+        Returns:
+            The hex digest of the session headers, cookies and
+            authentication
+        """
+        client = session.session
+
+        items = sorted((str(k).lower(), str(v)) for k, v in client.headers.items())
+        cookies = sorted((c.domain, c.path, c.name, str(c.value)) for c in client.cookies)
+
+        data = f"{items}\n{cookies}\n{client.cert!r}"
+
+        if client.auth is not None:
+            data = f"{data}\n{authidentity(client.auth)}"
+
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def get(self, key) -> tuple:
+        """Returns the cache entry for key
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            A tuple of (expires, status code, status, headers, body) or
+            None if the key is not in the cache
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+
+        if self.shared is True:
+            entry = cache.load("responses", key)
+            if isinstance(entry, tuple) and len(entry) == 5:
+                self.put(key, entry, persist=False)
+                return entry
+
+        return None
+
+    def put(self, key, entry, persist=True) -> None:
+        """Adds an entry to the cache evicting the least recently used entries
+
+        Args:
+            key (str): The cache key
+            entry (tuple): The cache entry
+            persist (bool): Enable or disable writing the entry to disk
+
+        Returns:
+            None
+        """
+        size = len(entry[4])
+
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[4])
+
+            if size <= self.max_bytes:
+                self.entries[key] = entry
+                self.size += size
+
+            while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted[4])
+                self.stats["evictions"] += 1
+
+        if persist is True and self.shared is True:
+            cache.dump("responses", key, entry)
+            self.sweep()
+
+    def sweep(self) -> None:
+        """Removes expired and excess responses from the on-disk cache
+
+        Returns:
+            None
+        """
+        now = time.monotonic()
+
+        with self.lock:
+            if self.swept is not None and now - self.swept < self.SWEEP_INTERVAL:
+                return
+            self.swept = now
+
+        removed = cache.prune("responses", self.disk_max_age, self.disk_max_bytes)
+
+        if removed:
+            display.vvvv(f"removed {removed} responses from the on-disk cache")
+
+    def count(self, name) -> None:
+        """Increments a cache counter
+
+        Args:
+            name (str): The name of the counter
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.stats[name] += 1
+
+    def lifetime(self, headers) -> float:
+        """Returns the number of seconds a response is fresh
+
+        Args:
+            headers (dict): The response headers
+
+        Returns:
+            The number of seconds or None if the response must not be cached
+        """
+        directives = dict(
+            (k.strip().lower(), v.strip()) for k, _, v in
+            (item.partition("=") for item in (headers.get("Cache-Control") or "").split(","))
+        )
+
+        if "no-store" in directives:
+            return None
+
+        if "no-cache" in directives:
+            return 0
+
+        if "max-age" in directives:
+            try:
+                return max(0, int(directives["max-age"]))
+            except ValueError:
+                return 0
+
+        return self.ttl
+
+    def send(self, session, request, url) -> Response:
+        """Returns the response for a GET request from the cache or the server
+
+        Args:
+            session (Session): The session used to send the request
+            request (Request): The request to send
+            url (str): The full URL for the request
+
+        Returns:
+            A `Response` object
+        """
+        display.trace("http.ResponseCache.send")
+
+        key = self.key(url, request.headers, session)
+        entry = self.get(key)
+        now = time.time()
+
+        if entry is not None and now < entry[0]:
+            self.count("hits")
+            display.trace(lambda: f"http.ResponseCache hit for {url}")
+            return Response(
+                status_code=entry[1],
+                status=entry[2],
+                headers=requests.structures.CaseInsensitiveDict(entry[3]),
+                body=entry[4],
+            )
+
+        conditional = dict()
+
+        if entry is not None:
+            cached = requests.structures.CaseInsensitiveDict(entry[3])
+            if cached.get("ETag"):
+                conditional["If-None-Match"] = cached["ETag"]
+            if cached.get("Last-Modified"):
+                conditional["If-Modified-Since"] = cached["Last-Modified"]
+
+        response = session._send(request, url, conditional)
+
+        if response.status_code == 304 and entry is not None:
+            self.count("revalidated")
+            display.trace(lambda: f"http.ResponseCache revalidated {url}")
+
+            headers = requests.structures.CaseInsensitiveDict(entry[3])
+            for name, value in response.headers.items():
+                if name.lower() not in ("content-length", "transfer-encoding", "content-encoding"):
+                    headers[name] = value
+            headers = dict(headers)
+
+            lifetime = self.lifetime(headers)
+            if lifetime is not None:
+                self.put(key, (now + lifetime, entry[1], entry[2], headers, entry[4]))
+
+            return Response(
+                status_code=entry[1],
+                status=entry[2],
+                headers=requests.structures.CaseInsensitiveDict(headers),
+                body=entry[4],
+            )
+
+        self.count("misses")
+
+        if response.status_code == 200:
+            lifetime = self.lifetime(response.headers)
+            if lifetime is not None:
+                self.put(key, (now + lifetime, response.status_code, response.status,
+                               dict(response.headers), bytes(response.body)))
+                self.count("stores")
+
+        return response
+
+
+def coalesced(flights, request) -> bool:
+    """Returns True if the request should be coalesced
+
+    Args:
+        flights (SingleFlight): The calls in flight or None if the
+            session does not coalesce requests
+        request (Request): The request to send
+
+    Returns:
+        True if the request can share a call in flight
+    """
+    if flights is None or request.coalesce is False:
+        return False
+
+    if request.coalesce is True:
+        return request.body is None or isinstance(request.body, (bytes, bytearray))
+
+    return request.method.upper() in ("GET", "HEAD") and request.body is None
+
+
+class Session(object):
+    """Session maintains an HTTP session with an API endpoint
+
+    The Session object holds the HTTP session with an API endpoint
+    include all session state such as authentication tokens,
+    cookies and more.
+
+    Args:
+        name (str): The name of the session
+        session (requests.Session): The requests library session.
+        retry (RetryPolicy): The default policy used to retry requests
+            sent by this session.  If None, requests are not retried
+            unless the request sets its own policy
+        rate_limit (float): The default maximum number of requests per
+            second to send to each host.  The value is typically taken
+            from the host vars, see `send_request`
+        cache (ResponseCache): The cache used for `GET` responses.  If
+            None, responses are not cached
+        coalesce (bool): Enable or disable sharing one call between
+            identical requests that are in flight at the same time, see
+            `SingleFlight`
+        auth (credentials.Authenticator): Authenticates the session
+            before requests are sent and logs in again when a request
+            is rejected with a 401.  If None, the session is not
+            authenticated
+        timeouts (Timeouts): The default timeouts for requests sent by
+            this session.  If None, requests wait indefinitely unless
+            the request sets its own timeouts
+        hedge (HedgePolicy): The default policy used to hedge requests.
+            If None, requests are not hedged unless the request sets its
+            own policy
+    """
+    def __init__(self, name, retry=None, rate_limit=None, cache=None, coalesce=False, auth=None,
+                 timeouts=None, hedge=None):
+        display.trace("http.Session.init")
+        self.name = name
+        self.session = requests.Session()
+        self.retry = retry
+        self.rate_limit = rate_limit
+        self.cache = cache
+        self.flights = SingleFlight() if coalesce else None
+        self.auth = auth
+        self.timeouts = timeouts
+        self.hedge = hedge
+        self.latencies = dict()
+
+    @display.traced("http.Session.send")
+    def send(self, request) -> Response:
+        """Send will send the request to the API endpoint and return the response
+
+        If the session has a response cache, `GET` requests are served
+        from the cache when possible.  If the session coalesces requests,
+        identical requests sent from other threads while this one is in
+        flight receive the same response.  If the session has an
+        authenticator, the stored credential is applied first and a
+        request rejected with a 401 is sent once more after logging in.
+        The request is only sent again when its body can be replayed,
+        otherwise the 401 response is returned.
+
+        Args:
+            request (Request): A `Request` object used to construct the HTTP
+                API call
+
+        Returns:
+            A `Response` object
+        """
+        display.trace("http.Session.send")
+
+        url = make_url(
+            request.host,
+            request.path,
+            request.port,
+            request.use_tls,
+        )
+
+        if self.auth is None:
+            return self._shared(request, url)
+
+        credential = self.auth.apply(self)
+
+        # an iterator is consumed and a file is at the end once the body
+        # has been sent so only a file that can be rewound is replayed
+        body = request.body
+        position = None
+        replayable = body is None or isinstance(body, (bytes, bytearray, memoryview, str, dict, os.PathLike))
+
+        if hasattr(body, "read") and hasattr(body, "seekable") and body.seekable():
+            position = body.tell()
+            replayable = True
+
+        resp = self._shared(request, url)
+
+        if resp.status_code == 401:
+            display.vvv(f"credential for {self.auth.host} was rejected, logging in again")
+            self.auth.apply(self, stale=credential)
+
+            if not replayable:
+                display.vvv(f"the request body for {url} cannot be sent again, returning the 401 response")
+                return resp
+
+            if position is not None:
+                body.seek(position)
+
+            resp = self._shared(request, url)
+
+        return resp
+
+    def _shared(self, request, url) -> Response:
+        """Sends the request or waits for an identical request in flight
+
+        Args:
+            request (Request): The request to send
+            url (str): The full URL for the request
+
+        Returns:
+            A `Response` object
+        """
+        if coalesced(self.flights, request):
+            key = self.flights.key(request.method, url, request.headers, request.body)
+            return self.flights.call(key, functools.partial(self._dispatch, request, url))
+
+        return self._dispatch(request, url)
+
+    def _dispatch(self, request, url) -> Response:
+        """Sends the request through the response cache if it applies
+
+        Args:
+            request (Request): The request to send
+            url (str): The full URL for the request
+
+        Returns:
+            A `Response` object
+        """
+        if self.cache is not None and request.method.upper() == "GET" and request.body is None:
+            return self.cache.send(self, request, url)
+
+        return self._send(request, url)
+
+    def _send(self, request, url, headers=None) -> Response:
+        """Sends the request to url and returns the response
+
+        The request is hedged when a hedge policy applies to it, see
+        `HedgePolicy`.
+
+        Args:
+            request (Request): The request to send
+            url (str): The full URL for the request
+            headers (dict): Additional headers to include in the request
+
+        Returns:
+            A `Response` object
+        """
+        timeouts = request.timeouts or self.timeouts
+        expires = None
+        if timeouts is not None and timeouts.deadline is not None:
+            expires = time.monotonic() + timeouts.deadline
+
+        hedge = request.hedge or self.hedge
+
+        if hedge is not None and request.method.upper() in hedge.methods and (
+            request.body is None or isinstance(request.body, (bytes, bytearray))
+        ):
+            return self._hedged(request, url, headers, hedge, expires)
+
+        return self._call(request, url, headers, expires)
+
+    def _call(self, request, url, headers=None, expires=None) -> Response:
+        """Sends a single request to url and records its latency
+
+        Args:
+            request (Request): The request to send
+            url (str): The full URL for the request
+            headers (dict): Additional headers to include in the request
+            expires (float): The monotonic time the request must complete
+                by or None
+
+        Returns:
+            A `Response` object
+        """
+        timeouts = request.timeouts or self.timeouts
+
+        deadline = None
+        if expires is not None:
+            deadline = expires - time.monotonic()
+            if deadline <= 0:
+                raise AnsibleError(f"Deadline exceeded sending request to {url}")
+
+        start = time.monotonic()
+
+        resp = send_request(
+            method=request.method,
+            url=url,
+            headers=dict(request.headers or {}, **headers) if headers else request.headers,
+            data=request.body,
+            timeout=timeouts.timeout() if timeouts is not None else None,
+            verify=request.verify,
+            disable_warnings=request.disable_warnings,
+            session=self.session,
+            compress=request.compress,
+            retry=request.retry or self.retry,
+            rate_limit=request.rate_limit or self.rate_limit,
+            deadline=deadline,
+        )
+
+        self.latency(url).add(time.monotonic() - start)
+
+        return Response(
+            status_code=resp.status_code,
+            status=resp.reason,
+            headers=resp.headers,
+            body=resp.content
+        )
+
+    def latency(self, url) -> Latency:
+        """Returns the recent latencies for the host in url
+
+        Args:
+            url (str): The full URL for a request
+
+        Returns:
+            A `Latency` object
+        """
+        host = urllib.parse.urlsplit(url).netloc
+
+        item = self.latencies.get(host)
+
+        if item is None:
+            item = self.latencies.setdefault(host, Latency())
+
+        return item
+
+    def _hedged(self, request, url, headers, hedge, expires) -> Response:
+        """Sends the request and hedges it if it is slow to complete
+
+        The request is sent and, if it has not completed after the
+        delay given by the hedge policy, a duplicate request is sent to
+        the next alternate host or to the same host.  The first response
+        received is returned.  The slower requests are left to complete
+        in the background and their responses are discarded.
+
+        Args:
+            request (Request): The request to send
+            url (str): The full URL for the request
+            headers (dict): Additional headers to include in the request
+            hedge (HedgePolicy): The hedge policy
+            expires (float): The monotonic time the request must complete
+                by or None
+
+        Returns:
+            A `Response` object
+        """
+        urls = [url] + [
+            make_url(host, request.path, request.port, request.use_tls) for host in hedge.hosts
+        ]
+
+        delay = hedge.delay(self.latency(url))
+
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=hedge.hedges + 1,
+            thread_name_prefix=f"http-{self.name}-hedge",
+        )
+
+        try:
+            pending = {display.submit(executor, self._call, request, url, headers, expires)}
+            sent = 1
+            error = None
+
+            while pending:
+                timeout = delay if sent <= hedge.hedges else None
+                if expires is not None:
+                    remaining = max(0, expires - time.monotonic())
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+
+                done, pending = concurrent.futures.wait(
+                    pending, timeout, concurrent.futures.FIRST_COMPLETED
+                )
+
+                for future in done:
+                    if future.exception() is None:
+                        if sent > 1:
+                            display.trace(lambda: f"http.Session.send hedged {sent - 1} times for {url}")
+                        return future.result()
+                    error = future.exception()
+
+                if expires is not None and time.monotonic() >= expires:
+                    break
+
+                if sent <= hedge.hedges and (not done or not pending):
+                    target = urls[sent % len(urls)]
+                    display.trace(lambda: f"http.Session.send hedging request to {target} after {delay:.3f}s")
+                    pending.add(display.submit(executor, self._call, request, target, headers, expires))
+                    sent += 1
+
+            if pending or error is None:
+                raise AnsibleError(f"Deadline exceeded sending request to {url}")
+
+            raise error
+
+        finally:
+            executor.shutdown(wait=False)
+
+    def stream(self, request, chunk_size=CHUNK_SIZE, checksum=None) -> typing.Iterator[bytes]:
+        """Sends the request and yields the response body in chunks
+
+        The response body is never held in memory in full so the memory
+        used is constant regardless of the size of the response.  Any
+        response with a status code of 400 or greater raises an error
+        before any chunks are yielded.
+
+        Args:
+            request (Request): A `Request` object used to construct the HTTP
+                API call
+
+            chunk_size (int): The maximum number of bytes in each chunk
+
+            checksum (str): The expected checksum of the body in the form
+                `<algorithm>:<hexdigest>`, for instance `sha256:ab12...`.
+                The checksum is computed as the chunks are received and
+                an error is raised after the last chunk if it does not
+                match
+
+        Returns:
+            An iterator of bytes objects
+        """
+        display.trace("http.Session.stream")
+
+        timeouts = request.timeouts or self.timeouts
+
+        url = make_url(
+            request.host,
+            request.path,
+            request.port,
+            request.use_tls,
+        )
+
+        if self.auth is not None:
+            self.auth.apply(self)
+
+        resp = send_request(
+            method=request.method,
+            url=url,
+            headers=request.headers,
+            data=request.body,
+            verify=request.verify,
+            disable_warnings=request.disable_warnings,
+            timeout=timeouts.timeout() if timeouts is not None else None,
+            session=self.session,
+            stream=True,
+            compress=request.compress,
+            retry=request.retry or self.retry,
+            rate_limit=request.rate_limit or self.rate_limit,
+            deadline=timeouts.deadline if timeouts is not None else None,
+        )
+
+        with resp:
+            if resp.status_code >= 400:
+                raise AnsibleError(f"Failed to download {url}: {resp.status_code} {resp.reason}")
+            yield from _chunks(resp, url, chunk_size, checksum)
+
+    def download(self, request, path, chunk_size=CHUNK_SIZE, checksum=None) -> Response:
+        """Sends the request and writes the response body to a file
+
+        The body is streamed to a temporary file in the same directory
+        as `path` which is renamed to `path` once the body has been
+        received and the checksum, if any, verified.  An existing file
+        at `path` is only replaced by a complete download.
+
+        Args:
+            request (Request): A `Request` object used to construct the HTTP
+                API call
+
+            path (str): The path of the file to write the body to
+
+            chunk_size (int): The maximum number of bytes to read at a time
+
+            checksum (str): The expected checksum of the body in the form
+                `<algorithm>:<hexdigest>`
+
+        Returns:
+            A `Response` object with no body
+        """
+        display.trace("http.Session.download")
+
+        timeouts = request.timeouts or self.timeouts
+
+        url = make_url(
+            request.host,
+            request.path,
+            request.port,
+            request.use_tls,
+        )
+
+        if self.auth is not None:
+            self.auth.apply(self)
+
+        resp = send_request(
+            method=request.method,
+            url=url,
+            headers=request.headers,
+            data=request.body,
+            verify=request.verify,
+            disable_warnings=request.disable_warnings,
+            timeout=timeouts.timeout() if timeouts is not None else None,
+            session=self.session,
+            stream=True,
+            compress=request.compress,
+            retry=request.retry or self.retry,
+            rate_limit=request.rate_limit or self.rate_limit,
+            deadline=timeouts.deadline if timeouts is not None else None,
+        )
+
+        with resp:
+            if resp.status_code >= 400:
+                raise AnsibleError(f"Failed to download {url}: {resp.status_code} {resp.reason}")
+
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".download")
+
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    for chunk in _chunks(resp, url, chunk_size, checksum):
+                        f.write(chunk)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+
+        return Response(
+            status_code=resp.status_code,
+            status=resp.reason,
+            headers=resp.headers,
+            body=None
+        )
 
-def send_request(method, url, headers=None, data=None, params=None, auth=None, timeout=None,
-                certificate_file=None, private_key_file=None, verify=None, disable_warnings=None,
-                session=None) -> requests.Response:
-    """ Send the request to the host and return the response
+    def paginate(self, request, pagination, prefetch=0) -> typing.Iterator[typing.Any]:
+        """Sends the request and yields the records from every page
 
-    This function sends the request to the host and waits for the
-    response.  The raw response object is returned to the calling
-    function.
+        The pages are requested as the records are consumed so only a
+        bounded number of pages is held in memory at any time.  When
+        `prefetch` is greater than zero and the pagination can determine
+        the total number of records from the first page, up to
+        `prefetch` subsequent pages are requested concurrently ahead of
+        the records being consumed.
 
-    Args:
-        method (str): The HTTP method for the request
-        url (str): The full HTTP URL to send the request to
-        headers (dict): A dictionary that contains any headers to include
-            in the request
-        data (bytes): A byte array to include in the body of the HTTP
-            API request
-        params (dict): A dictionary that cotains one or more values used
-            to construct a query string to include with the request
-        auth (typing.Any): A `requests` auth object
-        timeout (int): Configures the timeout for waiting for a response
-            from the remote API
-        verify (bool): Enable or disable certificate validation
-        disable_warnings (bool): Enable or disable `urllib3` warnings
-        session (requests.Session): A `requests.Session` object
+        Args:
+            request (Request): The request for the first page
 
-    Returns
-        A `Response` object that contains the response from the API call
-    """
-    display.trace("http.send_request")
+            pagination (typing.Any): The pagination strategy, one of
+                `OffsetPagination`, `CursorPagination` or `LinkPagination`
 
-    if disable_warnings is True:
-        urllib3.disable_warnings()
+            prefetch (int): The maximum number of pages to request ahead
 
-    kwargs = {
-        "method": method,
-        "url": url,
-        "headers": headers,
-        "params": params,
-        "verify": verify,
-    }
+        Returns:
+            An iterator of records
+        """
+        display.trace("http.Session.paginate")
 
-    if auth is not None:
-        kwargs["auth"] = auth
+        request = pagination.first(request)
 
-    if timeout is not None:
-        kwargs["timeout"] = timeout
+        while request is not None:
+            response = self._page(request)
+            records = lookup(response.json(), pagination.records) or []
 
-    if certificate_file is not None and private_key_file is not None:
-        kwargs["cert"] = (certificate_file, private_key_file)
+            yield from records
 
-    if data is not None:
-        if not isinstance(data, bytes):
-            raise AnsibleError(f"invalid type for data, expected bytes, got {type(data)}")
-        kwargs["data"] = data
+            if prefetch > 0:
+                pages = pagination.remaining(request, response, records)
+                if pages is not None:
+                    yield from self._prefetch(pages, pagination, prefetch)
+                    return
 
-    display.vvvvv(f"Request object: {kwargs}")
+            request = pagination.next(request, response, records)
 
-    try:
-        if session is not None:
-            resp = session.request(**kwargs)
-        else:
-            resp = requests.request(**kwargs)
+    def _page(self, request) -> Response:
+        """Sends the request for a page and checks the response status
 
-        display.vvv(f"HTTP response is {resp.status_code} {resp.reason}")
-        display.vvvvv(f"Start of response body\n{resp.text}\nEnd of response body")
-        display.vvvvv(f"Call completed in {resp.elapsed}")
+        Args:
+            request (Request): The request for the page
 
-    except requests.exceptions.ConnectionError as exc:
-        display.vvvvv(traceback.format_exc())
-        raise AnsibleError(f"Failed to establish a connection to {url}")
+        Returns:
+            A `Response` object
+        """
+        response = self.send(request)
+        if response.status_code >= 400:
+            raise AnsibleError(
+                f"Failed to retrieve page {request.path}: {response.status_code} {response.status}"
+            )
+        return response
 
-    except Exception as exc:
-        display.vvvvv(traceback.format_exc())
-        raise AnsibleError(str(exc))
+    def _prefetch(self, pages, pagination, prefetch) -> typing.Iterator[typing.Any]:
+        """Requests pages concurrently and yields their records in order
 
-    return resp
+        Args:
+            pages (iterator): The requests for the remaining pages
+            pagination (typing.Any): The pagination strategy
+            prefetch (int): The maximum number of pages in flight
 
+        Returns:
+            An iterator of records
+        """
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=prefetch,
+            thread_name_prefix=f"http-{self.name}",
+        )
 
-get = functools.partial(send_request, "GET")
-post = functools.partial(send_request, "POST")
-put = functools.partial(send_request, "PUT")
-delete = functools.partial(send_request, "DELETE")
-patch = functools.partial(send_request, "PATCH")
+        try:
+            window = collections.deque(
+                display.submit(executor, self._page, item) for item in itertools.islice(pages, prefetch)
+            )
 
+            while window:
+                response = window.popleft().result()
 
-def make_url(host, path, port=0, use_tls=True) -> str:
-    """ Join parts of the request to construct a valid URL
+                for item in itertools.islice(pages, 1):
+                    window.append(display.submit(executor, self._page, item))
 
-    This function will take the request object and join the
-    individual parts together to cnstruct a full URL.
+                yield from lookup(response.json(), pagination.records) or []
 
-    Args:
-        host (str): The hostname or IP address of the API endpoint
-        port (int): The port used to connect to the API
-        path (str): The URI path of the endpoint
-        use_tls (bool): Enable or disable TLS support
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-    Returns:
-        A string that represents the full URL
-    """
-    display.trace("http.make_url")
+    def send_many(self, reqs, max_concurrency=10, deadline=None, ordered=True) -> typing.Iterator[Result]:
+        """Sends many requests concurrently and yields the results
 
-    if port == 0:
-        port = 443 if use_tls is True else 80
+        The requests are sent using a pool of at most `max_concurrency`
+        threads that share this session.  An error sending any one
+        request is captured in its `Result` and does not affect the
+        other requests.  To keep a warm connection for each thread, the
+        pool `maxsize` should be at least `max_concurrency`, see
+        `set_pool_options`.
 
-    if port not in (None, 80, 443):
-        host = f"{host}:{port}"
+        Args:
+            reqs (iterable): The `Request` objects to send
 
-    if path[0] == "/":
-        path = path[1:]
+            max_concurrency (int): The maximum number of requests to send
+                at the same time
 
-    proto = "https" if use_tls else "http"
+            deadline (float): The total number of seconds to wait for all
+                of the requests.  Any request that has not completed when
+                the deadline expires is reported as an error.  A value of
+                None waits indefinitely
 
-    return urllib.parse.urlunsplit((proto, host, path, None, None))
+            ordered (bool): When True, results are yielded in the same
+                order as `reqs`.  When False, results are yielded as the
+                requests complete
 
+        Returns:
+            An iterator of `Result` objects, one for each request
+        """
+        display.trace("http.Session.send_many")
 
-def basic_auth(username, password) -> HTTPBasicAuth:
-    """Constructs a basic authentication object
+        reqs = list(reqs)
 
-    This function accepts a `username` and `password` argument
-    and will construct a basic authentication object that can
-    be used to in a request.
+        if not reqs:
+            return
+
+        expires = time.monotonic() + deadline if deadline is not None else None
+
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, min(max_concurrency, len(reqs))),
+            thread_name_prefix=f"http-{self.name}",
+        )
+
+        try:
+            futures = dict((display.submit(executor, self.send, item), item) for item in reqs)
+
+            if ordered is True:
+                pending = iter(futures.items())
+            else:
+                remaining = None if expires is None else max(0, expires - time.monotonic())
+                pending = ((f, futures[f]) for f in concurrent.futures.as_completed(futures, remaining))
+
+            done = set()
+
+            try:
+                for future, item in pending:
+                    remaining = None if expires is None else max(0, expires - time.monotonic())
+                    done.add(future)
+                    yield _result(future, item, remaining)
+
+            except concurrent.futures.TimeoutError:
+                for future, item in futures.items():
+                    if future not in done:
+                        yield _result(future, item, 0)
+
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _chunks(resp, url, chunk_size, checksum) -> typing.Iterator[bytes]:
+    """Yields the body of a streamed response in chunks
 
     Args:
-        username (str): The username to use when authenticating
-        password (str): The password to use when authenticating
+        resp (requests.Response): The streamed response
+        url (str): The URL of the request
+        chunk_size (int): The maximum number of bytes in each chunk
+        checksum (str): The expected checksum of the body in the form
+            `<algorithm>:<hexdigest>` or None
 
     Returns:
-        A `requests.HTTPBasicAuth` object
+        An iterator of bytes objects
+
+    Raises:
+        AnsibleError: If the connection fails or the checksum does not match
     """
-    display.trace("http.basic_auth")
-    return HTTPBasicAuth(username, password)
+    digest = None
 
+    if checksum is not None:
+        algorithm, _, expected = checksum.partition(":")
+        try:
+            digest = hashlib.new(algorithm.lower())
+        except ValueError:
+            raise AnsibleError(f"unsupported checksum algorithm: {algorithm}")
 
-@dataclass
-class Response(object):
-    """ Response respresents a response from an HTTP request
+    received = 0
+    start = time.monotonic()
 
-    The Response object provides access to the response from
-    a HTTP request that includes the body of the response, response
-    status and header information.
+    try:
+        for chunk in resp.iter_content(chunk_size):
+            received += len(chunk)
+            if digest is not None:
+                digest.update(chunk)
+            yield chunk
+
+    except requests.exceptions.RequestException as exc:
+        display.vvvvv(traceback.format_exc)
+        raise AnsibleError(f"Failed to read the response from {url}")
+
+    elapsed = time.monotonic() - start
+
+    display.trace(lambda: (
+        f"http.stream received {received} bytes in {elapsed:.3f}s "
+        f"({received / elapsed if elapsed > 0 else 0:.0f} bytes/sec)"
+    ))
+
+    if digest is not None and digest.hexdigest() != expected.lower():
+        raise AnsibleError(
+            f"checksum mismatch for {url}, expected {expected}, got {digest.hexdigest()}"
+        )
 
-    Args:
-        headers (dict): Set of key/value pairs returned from the API call
 
-        body (bytes): The body of the response
+def _result(future, request, timeout) -> Result:
+    """Waits for a future and converts its outcome into a Result
 
-        status_code (int): The HTTP status code in the response
+    Args:
+        future (concurrent.futures.Future): The future for the request
+        request (Request): The request that was sent
+        timeout (float): The number of seconds to wait for the future
 
-        status (str):  The HTTP status text in the response
+    Returns:
+        A `Result` object
     """
-    headers: dict
-    body: bytes
-    status_code: int
-    status: str
+    try:
+        return Result(request=request, response=future.result(timeout))
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        return Result(request=request, error=AnsibleError("deadline exceeded before the request completed"))
+    except Exception as exc:
+        return Result(request=request, error=exc)
 
 
-@dataclass
-class Request(object):
-    """Request represents an HTTP request
+class AsyncSession(object):
+    """AsyncSession maintains an asyncio based HTTP session with an API endpoint
 
-    The Request object represents an HTTP request to be sent
-    to an API endpoint.  The Request object is used to create
-    and send an API call.
+    The AsyncSession object is the asyncio counterpart to `Session`.  It
+    accepts the same `Request` objects and returns the same `Response`
+    objects but sends the requests over HTTP/1.1 connections managed by
+    the running event loop so many requests can be in flight at once
+    without using threads.  Idle connections are kept open and reused
+    and cookies returned by a server are sent on subsequent requests to
+    the same server.
+
+    Requests are not compressed, retried, rate limited or hedged and only
+    the total deadline of the request `timeouts` is applied.  A request
+    that sets any of the other options is rejected rather than sent
+    differently than `Session` would send it.
 
     Args:
-        host (str): The hostname or IP address of the API endpoint
+        name (str): The name of the session
 
-        port (int): The port used to connect to the API endpoint.  If
-            the value of the port is 0, it will automatically be
-            determined based on the `use_tls`
+        certificate_file (str): The path to the client certificate used
+            for TLS client authentication
 
-        method (str): The HTTP method to invoke.  Valid values include
-            `GET`, `POST`, `PUT`, `PATCH`, `DELETE`.
+        private_key_file (str): The path to the private key for the
+            client certificate
 
-        path (str): The URI to send the request to.  The URI will be
-            combined with the `host` and `port` to construct the full
-            URL to send the request to.
+        timeout (float): The number of seconds to wait for a request to
+            complete.  A value of None waits indefinitely
 
-        body (bytes): The body of the HTTP request.
+        coalesce (bool): Enable or disable sharing one call between
+            identical requests that are in flight at the same time, see
+            `SingleFlight`
+    """
+    def __init__(self, name, certificate_file=None, private_key_file=None, timeout=None, coalesce=False):
+        display.trace("http.AsyncSession.init")
+        self.name = name
+        self.certificate_file = certificate_file
+        self.private_key_file = private_key_file
+        self.timeout = timeout
+        self.flights = SingleFlight() if coalesce else None
+        self.cookies = http.cookiejar.CookieJar()
+        self._idle = dict()
 
-        headers (dict): The HTTP headers to set in the API request
+    async def __aenter__(self):
+        return self
 
-        use_tls (bool): Enable or disable the use of TLS when sending
-            the request to the API
+    async def __aexit__(self, *exc):
+        await self.close()
 
-        disable_warnings (bool): Enable or disable Python warnings
-            generated by urllib3
+    async def close(self) -> None:
+        """Closes all idle connections held by the session
 
-        verify (bool): Enable or disable certificate validation when
-            connecting to the API host.
+        Returns:
+            None
+        """
+        display.trace("http.AsyncSession.close")
 
-    """
-    host: str
-    port: int = 0
-    method: str = "GET"
-    path: str = None
-    body: bytes = None
-    headers: dict = field(default_factory=dict)
-    use_tls: bool = True
-    disable_warnings: bool = True
-    verify: bool = True
+        idle, self._idle = self._idle, dict()
 
+        for conns in idle.values():
+            for reader, writer in conns:
+                writer.close()
 
-class Session(object):
-    """Session maintains an HTTP session with an API endpoint
+    def context(self, verify) -> ssl.SSLContext:
+        """Returns the TLS context for the certificate validation setting
 
-    The Session object holds the HTTP session with an API endpoint
-    include all session state such as authentication tokens,
-    cookies and more.
+        Args:
+            verify (bool): Enable or disable certificate validation
 
-    Args:
-        name (str): The name of the session
-        session (requests.Session): The requests library session.
-    """
-    def __init__(self, name):
-        display.trace("http.Session.init")
-        self.name = name
-        self.session = requests.Session()
+        Returns:
+            A `ssl.SSLContext` object
+        """
+        cert = None
+        if self.certificate_file is not None and self.private_key_file is not None:
+            cert = (self.certificate_file, self.private_key_file)
 
-    def send(self, request) -> Response:
+        return sslcontext(verify, cert)
+
+    async def send(self, request) -> Response:
         """Send will send the request to the API endpoint and return the response
 
         Args:
@@ -252,8 +2748,29 @@ class Session(object):
 
         Returns:
             A `Response` object
+
+        Raises:
+            ValueError: If the request sets an option the session does
+                not support
         """
-        display.trace("http.Session.send")
+        display.trace("http.AsyncSession.send")
+
+        timeouts = request.timeouts or Timeouts()
+
+        unsupported = [
+            name for name, value in (
+                ("compress", request.compress),
+                ("retry", request.retry),
+                ("rate_limit", request.rate_limit),
+                ("hedge", request.hedge),
+                ("timeouts.connect", timeouts.connect),
+                ("timeouts.read", timeouts.read),
+            )
+            if value is not None and value is not False
+        ]
+
+        if unsupported:
+            raise ValueError(f"AsyncSession does not support the request options: {', '.join(unsupported)}")
 
         url = make_url(
             request.host,
@@ -262,19 +2779,249 @@ class Session(object):
             request.use_tls,
         )
 
-        resp = send_request(
-            method=request.method,
-            url=url,
-            headers=request.headers,
-            data=request.body,
-            verify=request.verify,
-            disable_warnings=request.disable_warnings,
-            session=self.session
-        )
+        if request.body is not None and not isinstance(request.body, bytes):
+            raise AnsibleError(f"invalid type for data, expected bytes, got {type(request.body)}")
+
+        if coalesced(self.flights, request):
+            key = self.flights.key(request.method, url, request.headers, request.body)
+            return await self.flights.acall(key, functools.partial(self._send, request, url))
+
+        return await self._send(request, url)
+
+    async def _send(self, request, url) -> Response:
+        """Sends the request to url and returns the response
+
+        Args:
+            request (Request): The request to send
+            url (str): The full URL for the request
+
+        Returns:
+            A `Response` object
+        """
+        display.vvvvv(lambda: f"Request object: {request}")
+
+        timeout = self.timeout
+        if request.timeouts is not None and request.timeouts.deadline is not None:
+            timeout = request.timeouts.deadline
+
+        start = time.monotonic()
+
+        try:
+            status_code, reason, headers, body = await asyncio.wait_for(
+                self._exchange(url, request), timeout
+            )
+
+        except (OSError, asyncio.IncompleteReadError) as exc:
+            display.vvvvv(traceback.format_exc)
+            raise AnsibleError(f"Failed to establish a connection to {url}")
+
+        except asyncio.TimeoutError:
+            display.vvvvv(traceback.format_exc)
+            raise AnsibleError(f"Timed out waiting for a response from {url}")
+
+        except (ValueError, asyncio.LimitOverrunError) as exc:
+            display.vvvvv(traceback.format_exc)
+            raise AnsibleError(f"Invalid response from {url}: {exc}")
+
+        display.vvv(f"HTTP response is {status_code} {reason}")
+        display.vvvvv(lambda: f"Start of response body\n{str(body, _charset(headers), 'replace')}\nEnd of response body")
+        display.vvvvv(f"Call completed in {time.monotonic() - start:.6f}s")
 
         return Response(
-            status_code=resp.status_code,
-            status=resp.reason,
-            headers=resp.headers,
-            body=resp.text
+            status_code=status_code,
+            status=reason,
+            headers=headers,
+            body=body
         )
+
+    async def _exchange(self, url, request) -> tuple:
+        """Writes the request to a connection and reads the response
+
+        A connection taken from the idle pool may have been closed by the
+        server.  In that case the request is retried once on a new
+        connection.
+
+        Args:
+            url (str): The full URL for the request
+            request (Request): The request to send
+
+        Returns:
+            A tuple of (status code, reason, headers, body)
+        """
+        parts = urllib.parse.urlsplit(url)
+        tls = parts.scheme == "https"
+        port = parts.port or (443 if tls else 80)
+        key = (parts.hostname, port, tls, request.verify)
+
+        target = parts.path or "/"
+        if parts.query:
+            target = f"{target}?{parts.query}"
+
+        if _ILLEGAL_TARGET.search(target) or _ILLEGAL_TARGET.search(request.method):
+            raise AnsibleError(f"invalid request line for {url}")
+
+        headers = {
+            "Host": parts.netloc,
+            "User-Agent": requests.utils.default_user_agent(),
+            "Accept": "*/*",
+            "Accept-Encoding": "identity",
+            "Connection": "keep-alive",
+        }
+
+        # the cookie jar selects the cookies that match the domain, path
+        # and scheme of the url
+        jar = urllib.request.Request(url)
+        self.cookies.add_cookie_header(jar)
+        if jar.has_header("Cookie"):
+            headers["Cookie"] = jar.get_header("Cookie")
+
+        headers.update(request.headers or {})
+
+        body = request.body or b""
+        if body or request.method in ("POST", "PUT", "PATCH"):
+            headers["Content-Length"] = str(len(body))
+
+        for name, value in headers.items():
+            if not _LEGAL_HEADER_NAME.fullmatch(str(name)) or _ILLEGAL_HEADER_VALUE.search(str(value)):
+                raise AnsibleError(f"invalid value for header {name!r}")
+
+        head = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+        payload = f"{request.method} {target} HTTP/1.1\r\n{head}\r\n".encode("latin-1") + body
+
+        while True:
+            reused = bool(self._idle.get(key))
+
+            if reused:
+                reader, writer = self._idle[key].pop()
+            else:
+                reader, writer = await asyncio.open_connection(
+                    parts.hostname,
+                    port,
+                    ssl=self.context(request.verify) if tls else None,
+                )
+
+            try:
+                writer.write(payload)
+                await writer.drain()
+                status_code, reason, resp_headers, resp_body, keepalive = await _readresponse(
+                    reader, request.method
+                )
+
+            except (OSError, asyncio.IncompleteReadError):
+                writer.close()
+                if reused:
+                    continue
+                raise
+
+            except BaseException:
+                writer.close()
+                raise
+
+            break
+
+        if keepalive:
+            self._idle.setdefault(key, list()).append((reader, writer))
+        else:
+            writer.close()
+
+        self.cookies.extract_cookies(_CookieResponse(resp_headers), jar)
+
+        return status_code, reason, requests.structures.CaseInsensitiveDict(resp_headers.items()), resp_body
+
+
+class _CookieResponse(object):
+    """Adapts the response headers to the interface used by `CookieJar`
+
+    Args:
+        headers (email.message.Message): The response headers
+    """
+    def __init__(self, headers):
+        self.headers = headers
+
+    def info(self) -> email.message.Message:
+        return self.headers
+
+
+# header names are tokens and header values may not contain line breaks,
+# the same rules `http.client` applies to requests
+_LEGAL_HEADER_NAME = re.compile(r"[^:\s][^:\r\n]*")
+_ILLEGAL_HEADER_VALUE = re.compile(r"\n(?![ \t])|\r(?![ \t\n])|[\r\n\x00]")
+_ILLEGAL_TARGET = re.compile(r"[\x00-\x20\x7f]")
+
+
+async def _readresponse(reader, method) -> tuple:
+    """Reads an HTTP/1.1 response from a stream
+
+    Args:
+        reader (asyncio.StreamReader): The stream to read from
+        method (str): The HTTP method of the request
+
+    Returns:
+        A tuple of (status code, reason, headers, body, keepalive)
+    """
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise asyncio.IncompleteReadError(line, None)
+
+        version, status_code, reason = (line.decode("latin-1").rstrip("\r\n").split(" ", 2) + [""])[:3]
+        status_code = int(status_code)
+
+        lines = list()
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            lines.append(line.decode("latin-1"))
+
+        headers = email.parser.Parser(policy=email.policy.compat32).parsestr("".join(lines), headersonly=True)
+
+        # skip any informational responses such as `100 Continue`
+        if not 100 <= status_code < 200:
+            break
+
+    connection = (headers.get("Connection") or "").lower()
+    keepalive = version == "HTTP/1.1" and connection != "close" or connection == "keep-alive"
+
+    if method == "HEAD" or status_code in (204, 304):
+        body = b""
+
+    elif (headers.get("Transfer-Encoding") or "").lower() == "chunked":
+        chunks = list()
+        while True:
+            size = int((await reader.readline()).split(b";", 1)[0].strip(), 16)
+            if size == 0:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+
+    elif headers.get("Content-Length") is not None:
+        body = await reader.readexactly(int(headers.get("Content-Length")))
+
+    else:
+        body = await reader.read()
+        keepalive = False
+
+    return status_code, reason, headers, body, keepalive
+
+
+def _charset(headers) -> str:
+    """Returns the character set of the response body
+
+    Args:
+        headers (dict): The response headers
+
+    Returns:
+        The name of the character set, defaults to utf-8
+    """
+    msg = email.message.Message()
+    msg["Content-Type"] = headers.get("Content-Type") or "text/plain"
+    charset = msg.get_content_charset() or "utf-8"
+    try:
+        codecs.lookup(charset)
+    except LookupError:
+        charset = "utf-8"
+    return charset
@@ -0,0 +1,480 @@
+# Copyright 2024, Itential Inc. All Rights Reserved
+
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import json
+import fcntl
+import typing
+import functools
+import bisect
+import tempfile
+import threading
+
+from ansible_collections.itential.core.plugins.module_utils import display
+
+
+METRICS_FILE_ENV = "ITENTIAL_METRICS_FILE"
+
+# upper bounds, in seconds, of the latency histogram buckets.  Values
+# greater than the last bound are counted in an overflow bucket
+BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+# the request phases that are measured
+PHASES = ("connect", "tls", "ttfb", "total")
+
+
+class Histogram(object):
+    """Histogram counts latencies in fixed buckets
+
+    The buckets are allocated when the histogram is created so that
+    recording a value does not allocate memory.
+
+    Args:
+        counts (list): The number of values in each bucket, see `BUCKETS`
+        count (int): The number of values recorded
+        sum (float): The sum of the values recorded
+    """
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value) -> None:
+        """Records a value
+
+        Args:
+            value (float): The latency in seconds
+
+        Returns:
+            None
+        """
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q) -> float:
+        """Returns the upper bound of the bucket that holds the quantile
+
+        Args:
+            q (float): The quantile between 0 and 1
+
+        Returns:
+            The latency in seconds or None if no values were recorded.
+            If the quantile falls in the overflow bucket, infinity is
+            returned
+        """
+        if self.count == 0:
+            return None
+
+        rank = q * self.count
+        seen = 0
+
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return BUCKETS[index] if index < len(BUCKETS) else float("inf")
+
+        return float("inf")
+
+    def todict(self) -> dict:
+        """Returns the histogram as a JSON serializable dict
+
+        Quantiles that fall in the overflow bucket are reported as the
+        string `+Inf`.
+
+        Returns:
+            A dict object
+        """
+        data = {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": list(self.counts),
+        }
+
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            value = self.quantile(q)
+            data[name] = "+Inf" if value == float("inf") else value
+
+        return data
+
+
+class Endpoint(object):
+    """Endpoint holds the metrics for requests to a host and path
+
+    Args:
+        phases (tuple): One `Histogram` per request phase, see `PHASES`
+        statuses (dict): The number of responses per status code
+        requests (int): The number of requests sent
+        errors (int): The number of requests that failed without a response
+        retries (int): The number of times requests were retried
+        sent (int): The number of request body bytes sent
+        received (int): The number of response body bytes received
+    """
+    __slots__ = ("phases", "statuses", "requests", "errors", "retries", "sent", "received")
+
+    def __init__(self):
+        self.phases = tuple(Histogram() for _ in PHASES)
+        self.statuses = dict()
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.sent = 0
+        self.received = 0
+
+
+class Registry(object):
+    """Registry collects the request metrics for the process
+
+    The Registry object keeps one `Endpoint` per host and path and the
+    number of connections that were opened or reused from a pool.
+
+    Args:
+        enabled (bool): Enable or disable recording metrics
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.endpoints = dict()
+        self.opened = 0
+        self.reused = 0
+
+    def endpoint(self, host, path) -> Endpoint:
+        """Returns the metrics for host and path
+
+        Args:
+            host (str): The host and port
+            path (str): The request path
+
+        Returns:
+            An `Endpoint` object
+        """
+        key = (host, path)
+
+        item = self.endpoints.get(key)
+
+        if item is None:
+            item = self.endpoints.setdefault(key, Endpoint())
+
+        return item
+
+    def record(self, host, path, status, timings, sent=0, received=0, retries=0, opened=0) -> None:
+        """Records a completed request
+
+        Args:
+            host (str): The host and port
+            path (str): The request path
+            status (int): The response status code or None if the
+                request failed without a response
+            timings (tuple): The duration of each phase in seconds, see
+                `PHASES`.  A phase that did not occur is None
+            sent (int): The number of request body bytes sent
+            received (int): The number of response body bytes received
+            retries (int): The number of times the request was retried
+            opened (int): The number of new connections opened
+
+        Returns:
+            None
+        """
+        item = self.endpoint(host, path)
+
+        with self.lock:
+            item.requests += 1
+            item.retries += retries
+            item.sent += sent
+            item.received += received
+
+            if status is None:
+                item.errors += 1
+            else:
+                item.statuses[status] = item.statuses.get(status, 0) + 1
+
+            for histogram, value in zip(item.phases, timings):
+                if value is not None:
+                    histogram.observe(value)
+
+            # a request that failed may not have had a connection so it
+            # is not counted as reusing one
+            self.opened += opened
+            if status is not None:
+                self.reused += max(0, 1 + retries - opened)
+
+    def snapshot(self) -> dict:
+        """Returns the metrics as a JSON serializable dict
+
+        Returns:
+            A dict object
+        """
+        with self.lock:
+            endpoints = [
+                {
+                    "host": host,
+                    "path": path,
+                    "requests": item.requests,
+                    "errors": item.errors,
+                    "retries": item.retries,
+                    "bytes_sent": item.sent,
+                    "bytes_received": item.received,
+                    "statuses": dict((str(k), v) for k, v in sorted(item.statuses.items())),
+                    "latency": dict(
+                        (name, histogram.todict()) for name, histogram in zip(PHASES, item.phases)
+                    ),
+                }
+                for (host, path), item in self.endpoints.items()
+            ]
+
+            total = self.opened + self.reused
+
+            return {
+                "buckets": list(BUCKETS),
+                "endpoints": endpoints,
+                "connections": {
+                    "opened": self.opened,
+                    "reused": self.reused,
+                    "reuse_ratio": self.reused / total if total else None,
+                },
+            }
+
+    def reset(self) -> None:
+        """Discards all recorded metrics
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.endpoints.clear()
+            self.opened = 0
+            self.reused = 0
+
+
+registry = Registry()
+
+_local = threading.local()
+
+
+def begin() -> None:
+    """Starts measuring the connection phases of a request
+
+    The connect and TLS phases are measured by the transport while the
+    request is sent and are accumulated per thread.
+
+    Returns:
+        None
+    """
+    _local.connect = None
+    _local.tls = None
+    _local.opened = 0
+
+
+def connected(seconds) -> None:
+    """Records the time spent resolving and connecting to the host
+
+    Args:
+        seconds (float): The duration in seconds
+
+    Returns:
+        None
+    """
+    _local.connect = (getattr(_local, "connect", None) or 0.0) + seconds
+    _local.opened = getattr(_local, "opened", 0) + 1
+
+
+def handshake(seconds) -> None:
+    """Records the time spent in the TLS handshake
+
+    Args:
+        seconds (float): The duration in seconds
+
+    Returns:
+        None
+    """
+    _local.tls = (getattr(_local, "tls", None) or 0.0) + seconds
+
+
+def record(host, path, status, ttfb, total, sent=0, received=0, retries=0) -> None:
+    """Records a completed request in the process registry
+
+    The connect and TLS phases recorded since `begin` was called are
+    included.
+
+    Args:
+        host (str): The host and port
+        path (str): The request path
+        status (int): The response status code or None if the request
+            failed without a response
+        ttfb (float): The seconds until the response headers were received
+        total (float): The total duration of the request in seconds
+        sent (int): The number of request body bytes sent
+        received (int): The number of response body bytes received
+        retries (int): The number of times the request was retried
+
+    Returns:
+        None
+    """
+    if registry.enabled is not True:
+        return
+
+    registry.record(
+        host,
+        path,
+        status,
+        (getattr(_local, "connect", None), getattr(_local, "tls", None), ttfb, total),
+        sent,
+        received,
+        retries,
+        getattr(_local, "opened", 0),
+    )
+
+
+def snapshot() -> dict:
+    """Returns the metrics for the process as a JSON serializable dict
+
+    Returns:
+        A dict object
+    """
+    return registry.snapshot()
+
+
+def dumps() -> str:
+    """Returns the metrics for the process as a JSON document
+
+    Returns:
+        The JSON document as a string
+    """
+    return json.dumps(snapshot(), indent=2)
+
+
+def merge(current, other) -> dict:
+    """Merges two metrics snapshots
+
+    Args:
+        current (dict): A snapshot returned by `snapshot`
+        other (dict): A snapshot returned by `snapshot`
+
+    Returns:
+        A new snapshot with the values of both
+    """
+    endpoints = dict()
+
+    for item in current.get("endpoints", ()) + other.get("endpoints", ()):
+        key = (item["host"], item["path"])
+        entry = endpoints.get(key)
+
+        if entry is None:
+            endpoints[key] = json.loads(json.dumps(item))
+            continue
+
+        for name in ("requests", "errors", "retries", "bytes_sent", "bytes_received"):
+            entry[name] += item[name]
+
+        for code, count in item["statuses"].items():
+            entry["statuses"][code] = entry["statuses"].get(code, 0) + count
+
+        for name, values in item["latency"].items():
+            histogram = Histogram()
+            histogram.counts = [a + b for a, b in zip(entry["latency"][name]["buckets"], values["buckets"])]
+            histogram.count = entry["latency"][name]["count"] + values["count"]
+            histogram.sum = entry["latency"][name]["sum"] + values["sum"]
+            entry["latency"][name] = histogram.todict()
+
+    opened = current.get("connections", {}).get("opened", 0) + other.get("connections", {}).get("opened", 0)
+    reused = current.get("connections", {}).get("reused", 0) + other.get("connections", {}).get("reused", 0)
+
+    return {
+        "buckets": list(BUCKETS),
+        "endpoints": list(endpoints.values()),
+        "connections": {
+            "opened": opened,
+            "reused": reused,
+            "reuse_ratio": reused / (opened + reused) if opened + reused else None,
+        },
+    }
+
+
+def dump(path, reset=True) -> None:
+    """Adds the metrics for the process to a JSON file
+
+    The file is locked while it is updated so that every forked worker
+    can dump its metrics to the same file at the end of a task.  The
+    metrics already in the file are merged with the metrics of the
+    process.
+
+    Args:
+        path (str): The path to the JSON file
+        reset (bool): Discard the metrics for the process once they are
+            written so they are not counted twice
+
+    Returns:
+        None
+    """
+    with open(f"{path}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        data = snapshot()
+
+        try:
+            with open(path) as f:
+                data = merge(json.load(f), data)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as exc:
+            display.vvvv(f"unable to read metrics file {path}: {exc}")
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    if reset is True:
+        registry.reset()
+
+
+def flush() -> None:
+    """Adds the metrics for the process to the file in `ITENTIAL_METRICS_FILE`
+
+    Nothing is written if the environment variable is not set or no
+    requests were recorded.
+
+    Returns:
+        None
+    """
+    path = os.environ.get(METRICS_FILE_ENV)
+
+    if path and registry.endpoints:
+        dump(path)
+
+
+def flushed(func) -> typing.Callable:
+    """Decorator that flushes the metrics when a function returns
+
+    Ansible workers exit without running `atexit` handlers so the
+    metrics are flushed at the end of each task instead.  Action plugins
+    that send requests decorate their `run` method so the metrics of
+    the task are added to `ITENTIAL_METRICS_FILE`, see `flush`.
+
+    Args:
+        func (callable): The function to decorate
+
+    Returns:
+        The decorated function
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            try:
+                flush()
+            except OSError as exc:
+                display.vvvv(f"unable to write metrics file: {exc}")
+
+    return wrapper
@@ -0,0 +1,106 @@
+# Copyright 2024, Itential Inc. All Rights Reserved
+
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import json
+import time
+import typing
+import functools
+import multiprocessing
+
+
+PROFILE_FILE_ENV = "ITENTIAL_PROFILE_FILE"
+
+
+def context() -> tuple:
+    """Returns the task and host the current worker is running
+
+    Ansible runs each task for each host in a forked worker process
+    that holds the task and host it was started for.
+
+    Returns:
+        A tuple of (task uuid, host name).  Either value is None when
+        called outside of a worker process
+    """
+    proc = multiprocessing.current_process()
+
+    task = getattr(proc, "_task", None)
+    host = getattr(proc, "_host", None)
+
+    return (
+        getattr(task, "_uuid", None),
+        getattr(host, "name", None),
+    )
+
+
+def record(name, seconds, path=None) -> None:
+    """Appends a timing record to the profile file
+
+    Each record is written as a single JSON line using one append so
+    records from concurrent workers are never interleaved.
+
+    Args:
+        name (str): The name of the helper that was timed
+        seconds (float): The time spent in the helper
+        path (str): The profile file.  If None, the value of
+            `ITENTIAL_PROFILE_FILE` is used
+
+    Returns:
+        None
+    """
+    path = path or os.environ.get(PROFILE_FILE_ENV)
+    if not path:
+        return
+
+    task, host = context()
+
+    line = json.dumps({
+        "task": task,
+        "host": host,
+        "name": name,
+        "seconds": seconds,
+    }) + "\n"
+
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, line.encode("utf-8"))
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def timed(name) -> typing.Callable:
+    """Decorator that records the time spent in a function
+
+    The time is only recorded when `ITENTIAL_PROFILE_FILE` is set,
+    typically by the `itential.core.profile_helpers` callback plugin.
+    Otherwise the function is called directly.
+
+    Args:
+        name (str): The name reported for the function
+
+    Returns:
+        The decorator
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            path = os.environ.get(PROFILE_FILE_ENV)
+
+            if not path:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start, path)
+
+        return wrapper
+
+    return decorator
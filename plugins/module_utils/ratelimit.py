@@ -0,0 +1,168 @@
+# Copyright 2024, Itential Inc. All Rights Reserved
+
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import time
+import fcntl
+import struct
+import hashlib
+import tempfile
+
+from ansible.errors import AnsibleError
+
+from ansible_collections.itential.core.plugins.module_utils import cache
+from ansible_collections.itential.core.plugins.module_utils import display
+
+
+STATE = struct.Struct("dd")
+
+
+_buckets = {}
+
+
+def directory() -> str:
+    """Returns the directory that holds the token bucket state files
+
+    The state is stored in the `ratelimit` namespace of the on-disk
+    cache when `ITENTIAL_CACHE_DIR` is set, otherwise in a per-user
+    directory under the system temporary directory.
+
+    Returns:
+        The path to the directory
+    """
+    return cache.directory("ratelimit") or os.path.join(
+        tempfile.gettempdir(), f"itential-{os.getuid()}", "ratelimit"
+    )
+
+
+class TokenBucket(object):
+    """TokenBucket limits the rate of requests shared across processes
+
+    The TokenBucket object stores its state, the number of available
+    tokens and the time they were last updated, in a small file that is
+    locked while it is updated.  The directory is created with
+    `cache.makedirs` and the file is never opened through a symlink.  Every process that creates a bucket
+    with the same name shares the same state so the aggregate rate
+    across all forked workers stays at the configured rate.
+
+    Args:
+        name (str): The name of the bucket, typically the host the
+            requests are sent to
+        rate (float): The number of tokens added to the bucket per second
+        burst (float): The maximum number of tokens the bucket holds
+        path (str): The path to the state file
+    """
+    def __init__(self, name, rate, burst=None, path=None):
+        if rate <= 0:
+            raise ValueError("rate must be greater than zero")
+
+        self.name = name
+        self.rate = float(rate)
+        self.burst = float(burst) if burst is not None else max(1.0, self.rate)
+
+        if path is None:
+            digest = hashlib.sha256(name.encode("utf-8")).hexdigest()
+            path = os.path.join(directory(), digest)
+
+        self.path = path
+
+        cache.makedirs(os.path.dirname(self.path))
+
+    def take(self, tokens=1) -> float:
+        """Attempts to take tokens from the bucket
+
+        Args:
+            tokens (float): The number of tokens to take
+
+        Returns:
+            Zero if the tokens were taken or the number of seconds to wait
+            before enough tokens are available
+
+        Raises:
+            AnsibleError: If the state file cannot be opened, for
+                instance because it is a symlink
+        """
+        # the file is opened for each call since flock locks are shared
+        # by all processes that inherit the same open file
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        except OSError as exc:
+            raise AnsibleError(f"unable to open rate limit state file {self.path}: {exc}")
+
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+
+            now = time.monotonic()
+            data = os.pread(fd, STATE.size, 0)
+
+            if len(data) == STATE.size:
+                level, last = STATE.unpack(data)
+                if last > now:
+                    level, last = self.burst, now
+            else:
+                level, last = self.burst, now
+
+            level = min(self.burst, level + (now - last) * self.rate)
+
+            if level >= tokens:
+                level -= tokens
+                wait = 0.0
+            else:
+                wait = (tokens - level) / self.rate
+
+            os.pwrite(fd, STATE.pack(level, now), 0)
+
+        finally:
+            os.close(fd)
+
+        return wait
+
+    def acquire(self, tokens=1) -> float:
+        """Waits until tokens are available and takes them from the bucket
+
+        Args:
+            tokens (float): The number of tokens to take
+
+        Returns:
+            The number of seconds spent waiting
+        """
+        waited = 0.0
+
+        while True:
+            wait = self.take(tokens)
+            if wait <= 0:
+                break
+            time.sleep(wait)
+            waited += wait
+
+        if waited > 0:
+            display.trace(lambda: f"ratelimit.acquire waited {waited:.3f}s for {self.name}")
+
+        return waited
+
+
+def bucket(name, rate, burst=None) -> TokenBucket:
+    """Returns the token bucket for name
+
+    The bucket object is cached per process for each name, rate and
+    burst.  The state of the bucket is shared by all processes.
+
+    Args:
+        name (str): The name of the bucket
+        rate (float): The number of tokens added to the bucket per second
+        burst (float): The maximum number of tokens the bucket holds
+
+    Returns:
+        A `TokenBucket` object
+    """
+    key = (name, rate, burst)
+
+    item = _buckets.get(key)
+
+    if item is None:
+        item = TokenBucket(name, rate, burst)
+        _buckets[key] = item
+
+    return item
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+"""bench_validate
+This script measures the throughput of `args.validate` on large list
+payloads and compares it with the recursive schema walk that was used
+before the validators were compiled.  The collection must be
+importable, for instance by running the script with PYTHONPATH set to
+the directory that contains `ansible_collections/itential/core`.
+"""
+
+import sys
+import timeit
+
+from ansible.errors import AnsibleError
+
+from ansible_collections.itential.core.plugins.module_utils import args
+
+
+ELEMENTS = 10000
+ROUNDS = 5
+
+
+strings = {
+    "type": "list",
+    "elements": "str",
+}
+
+interfaces = {
+    "type": "list",
+    "elements": "dict",
+    "suboptions": {
+        "name": {"type": "str", "required": True},
+        "mtu": {"type": "int", "default": 1500},
+        "enabled": {"type": "bool"},
+        "mode": {"type": "str", "choices": ["access", "trunk"]},
+        "vlans": {"type": "list", "elements": "int"},
+        "address": {
+            "type": "dict",
+            "suboptions": {
+                "ip": {"type": "str", "required": True},
+                "prefix": {"type": "int", "aliases": ["mask"]},
+            },
+        },
+    },
+}
+
+
+def baseline(value, option) -> None:
+    """Validates value with the recursive schema walk
+
+    This is the implementation of `args.validate` before the option
+    schemas were compiled and is kept for comparison.
+
+    Args:
+        value (any): The value to validate
+        option (dict): The schema used to validate the value
+
+    Returns:
+        None
+    """
+    choices = option.get("choices")
+    if choices and value not in choices:
+        raise AnsibleError(f"invalid value, expected one of {', '.join(choices)}, got {value}")
+
+    field_type = option.get("type") or "str"
+
+    baselinetype(field_type, value)
+
+    if field_type == "list":
+        eletype = option.get("elements")
+        for ele in value:
+            baselinetype(eletype, ele)
+
+    suboptions = option.get("suboptions")
+
+    if suboptions is not None:
+        if field_type == "dict":
+            for key, item in suboptions.items():
+                baselinevalue(value, key, item)
+        elif field_type == "list":
+            for ele in value:
+                for key, item in suboptions.items():
+                    baselinevalue(ele, key, item)
+
+    if value and isinstance(value, dict) and suboptions is not None:
+        for key in value:
+            if key not in suboptions:
+                raise AnsibleError(f"unknown argument: {key}")
+
+
+def baselinetype(fieldtype, value) -> None:
+    """Validates the value is the correct type with the if-chain
+
+    Args:
+        fieldtype (str): The field type to check the against
+        value (any): The field value to validate
+
+    Returns:
+        None
+    """
+    if (fieldtype == "bool" and not isinstance(value, bool)) or \
+        (fieldtype == "int" and not isinstance(value, int)) or \
+        (fieldtype == "dict" and not isinstance(value, dict)) or \
+        (fieldtype == "list" and not isinstance(value, list)) or \
+        (fieldtype == "str" and not isinstance(value, str)):
+            raise AnsibleError("invalid data type for field")
+
+
+def baselinevalue(args, name, opt) -> None:
+    """Resolves and validates the value specified by name in args
+
+    Args:
+        args (dict): A dictionary object that contains the values
+        name (str): The name of the value to retrieve from `args`
+        opt (dict): The schema used to validate the value
+
+    Returns:
+        None
+    """
+    value = args.get(name)
+
+    if value is None:
+        for ele in opt.get("aliases") or []:
+            value = args.get(ele)
+            if value is not None:
+                break
+
+    if value is None and opt.get("default") is not None:
+        value = opt.get("default")
+
+    if not value and opt.get("required"):
+        raise AnsibleError(f"missing required argument: {name}")
+
+    if value is not None:
+        baseline(value, opt)
+
+
+def measure(func, value, option) -> float:
+    """Returns the best time to validate value
+
+    Args:
+        func (callable): The validation function
+        value (any): The value to validate
+        option (dict): The schema used to validate the value
+
+    Returns:
+        The elapsed time in seconds of the fastest round
+    """
+    return min(timeit.repeat(lambda: func(value, option), number=1, repeat=ROUNDS))
+
+
+def payloads(count) -> tuple:
+    """Builds the benchmark payloads
+
+    Args:
+        count (int): The number of elements in each payload
+
+    Returns:
+        A tuple of (name, option, value) entries
+    """
+    return (
+        ("list of str", strings, [f"item{i}" for i in range(count)]),
+        ("list of dict", interfaces, [
+            {
+                "name": f"eth{i}",
+                "mtu": 9000,
+                "enabled": True,
+                "mode": "trunk",
+                "vlans": [1, 2, 3],
+                "address": {"ip": f"10.0.{i // 256}.{i % 256}", "prefix": 24},
+            }
+            for i in range(count)
+        ]),
+    )
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else ELEMENTS
+
+    print(f"{'':<14} {'before':>12} {'after':>12} {'speedup':>9}")
+
+    for name, option, value in payloads(count):
+        before = measure(baseline, value, option)
+        after = measure(args.validate, value, option)
+        print(f"{name:<14} {before * 1000:9.2f} ms {after * 1000:9.2f} ms {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
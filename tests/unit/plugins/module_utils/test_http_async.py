@@ -0,0 +1,162 @@
+# Copyright 2024, Itential Inc. All Rights Reserved
+
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import asyncio
+import threading
+import socketserver
+
+import pytest
+
+from ansible.errors import AnsibleError
+
+from ansible_collections.itential.core.plugins.module_utils import http
+
+
+class Handler(socketserver.StreamRequestHandler):
+    """Handler answers HTTP/1.1 requests on a keep-alive connection
+
+    The response is selected by the request path so each test can
+    exercise a different part of the client.
+    """
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+
+            method, path, _ = line.decode("latin-1").split(" ", 2)
+
+            headers = dict()
+            while True:
+                line = self.rfile.readline().decode("latin-1")
+                if line in ("\r\n", ""):
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            self.rfile.read(int(headers.get("content-length") or 0))
+
+            with self.server.lock:
+                self.server.requests.append((method, path, headers))
+
+            if path == "/length":
+                self.reply(b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\nhello")
+
+            elif path == "/chunked":
+                self.reply(
+                    b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                    b"3\r\nhel\r\n2;ext=1\r\nlo\r\n0\r\n\r\n"
+                )
+
+            elif path == "/malformed":
+                self.reply(b"HTTP/1.1 abc OK\r\nContent-Length: 0\r\n\r\n")
+                return
+
+            elif path == "/login":
+                self.reply(b"HTTP/1.1 200 OK\r\nSet-Cookie: sid=abc; Path=/\r\nContent-Length: 0\r\n\r\n")
+
+            else:
+                body = (headers.get("cookie") or "").encode("latin-1")
+                self.reply(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+
+    def reply(self, data):
+        self.wfile.write(data)
+        self.wfile.flush()
+
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = list()
+
+
+@pytest.fixture
+def server():
+    srv = Server()
+    thread = threading.Thread(target=srv.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def request(srv, path, host="127.0.0.1", **kwargs):
+    return http.Request(host=host, port=srv.server_address[1], path=path, use_tls=False, **kwargs)
+
+
+def run(srv, *reqs):
+    async def main():
+        async with http.AsyncSession("test") as session:
+            return [await session.send(item) for item in reqs]
+    return asyncio.run(main())
+
+
+def test_content_length(server):
+    resp, = run(server, request(server, "/length"))
+    assert resp.status_code == 200
+    assert resp.status == "OK"
+    assert resp.body == b"hello"
+
+
+def test_chunked(server):
+    resp, = run(server, request(server, "/chunked"))
+    assert resp.status_code == 200
+    assert resp.body == b"hello"
+
+
+def test_keep_alive_reuses_connection(server):
+    resps = run(server, request(server, "/length"), request(server, "/chunked"), request(server, "/length"))
+    assert [resp.body for resp in resps] == [b"hello"] * 3
+    assert server.connections == 1
+    assert len(server.requests) == 3
+
+
+def test_malformed_status_line(server):
+    with pytest.raises(AnsibleError, match="Invalid response"):
+        run(server, request(server, "/malformed"))
+
+
+def test_cookies_are_sent_to_the_same_host(server):
+    resps = run(
+        server,
+        request(server, "/login"),
+        request(server, "/echo"),
+        request(server, "/echo", host="localhost"),
+    )
+    assert resps[1].body == b"sid=abc"
+    assert resps[2].body == b""
+
+
+def test_header_injection_is_rejected(server):
+    with pytest.raises(AnsibleError, match="invalid value for header"):
+        run(server, request(server, "/length", headers={"X-Test": "a\r\nX-Injected: 1"}))
+    assert server.requests == []
+
+
+@pytest.mark.parametrize("options", [
+    {"compress": True},
+    {"retry": http.RetryPolicy()},
+    {"rate_limit": 10.0},
+    {"hedge": http.HedgePolicy()},
+    {"timeouts": http.Timeouts(connect=1.0)},
+    {"timeouts": http.Timeouts(read=1.0)},
+])
+def test_unsupported_options_are_rejected(server, options):
+    with pytest.raises(ValueError, match="does not support"):
+        run(server, request(server, "/length", **options))
+    assert server.requests == []
+
+
+def test_deadline(server):
+    resp, = run(server, request(server, "/length", timeouts=http.Timeouts(deadline=5.0)))
+    assert resp.body == b"hello"
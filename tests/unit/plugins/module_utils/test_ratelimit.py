@@ -0,0 +1,128 @@
+# Copyright 2024, Itential Inc. All Rights Reserved
+
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import time
+import threading
+import http.server
+import multiprocessing
+
+import pytest
+
+from ansible.errors import AnsibleError
+
+from ansible_collections.itential.core.plugins.module_utils import cache
+from ansible_collections.itential.core.plugins.module_utils import http as client
+from ansible_collections.itential.core.plugins.module_utils import ratelimit
+
+
+RATE = 20.0
+WORKERS = 4
+REQUESTS = 10
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.arrivals.append(time.monotonic())
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.lock = threading.Lock()
+        self.arrivals = list()
+
+
+@pytest.fixture
+def server():
+    srv = Server()
+    thread = threading.Thread(target=srv.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def cachedir(tmp_path, monkeypatch):
+    path = tmp_path / "cache"
+    path.mkdir(mode=0o700)
+    monkeypatch.setenv(cache.CACHE_DIR_ENV, str(path))
+    monkeypatch.setattr(ratelimit, "_buckets", {})
+    return path
+
+
+def worker(url):
+    for _ in range(REQUESTS):
+        client.send_request("GET", url, rate_limit=RATE)
+
+
+def test_forked_workers_share_one_bucket(server, cachedir):
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=worker, args=(url,)) for _ in range(WORKERS)]
+
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join(30)
+        assert proc.exitcode == 0
+
+    total = WORKERS * REQUESTS
+    assert len(server.arrivals) == total
+
+    # the burst is sent at once and the remaining requests at the rate
+    expected = (total - RATE) / RATE
+    elapsed = max(server.arrivals) - min(server.arrivals)
+    assert elapsed >= expected * 0.9
+
+
+def test_take_reports_wait(cachedir):
+    bucket = ratelimit.TokenBucket("test", rate=10.0, burst=1)
+    assert bucket.take() == 0
+    assert 0 < bucket.take() <= 0.1
+
+
+def test_symlinked_state_file_is_refused(cachedir, tmp_path):
+    target = tmp_path / "target"
+    target.write_bytes(b"keep")
+
+    bucket = ratelimit.TokenBucket("test", rate=10.0)
+    os.symlink(target, bucket.path)
+
+    with pytest.raises(AnsibleError, match="unable to open"):
+        bucket.take()
+
+    assert target.read_bytes() == b"keep"
+
+
+def test_directory_accessible_by_others_is_refused(cachedir):
+    path = cachedir / "ratelimit"
+    path.mkdir(mode=0o700)
+    path.chmod(0o755)
+
+    with pytest.raises(AnsibleError, match="not accessible by other users"):
+        ratelimit.TokenBucket("test", rate=10.0)
+
+
+def test_symlinked_directory_is_refused(cachedir, tmp_path):
+    target = tmp_path / "elsewhere"
+    target.mkdir(mode=0o700)
+    os.symlink(target, cachedir / "ratelimit")
+
+    with pytest.raises(AnsibleError, match="must be owned by the current user"):
+        ratelimit.TokenBucket("test", rate=10.0)